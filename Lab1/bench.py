@@ -0,0 +1,210 @@
+# Throughput and regression check for the mate/stalemate search engines.
+#
+#   python bench.py                              # pruned engine, all squares and pairs
+#   python bench.py --engine full --bk e8        # every placement through classify
+#   python bench.py --engine numpy --memory      # also report peak memory
+#   python bench.py --update                     # rebuild bench_golden.json (reference engine)
+#
+# Every engine runs each black king square directly (no symmetry, no cache),
+# so all 64 squares are timed. Per pair and square the golden file stores
+# [mates, stalemates, crc32 of the solution codes]; any engine has to
+# reproduce it exactly. The golden file is built by the reference engine:
+# the original set-based check from main.py, which shares no code with
+# bitboard.py (about an hour for all squares and pairs).
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+import zlib
+from array import array
+
+from bitboard import sq_to_alg
+from cli import parse_pair, parse_square
+from search import PAIRS, pack, white_king_squares, search_white_king, search_white_king_full
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_golden.json')
+
+
+# --- Reference engine ---
+# attacks_by/black_has_legal_king_move as main.py had them before bitboard.py,
+# with one fix: the white king now blocks sliders (the old board dict kept it
+# under a string key, so rays went through it). occupied is a set of squares.
+
+def _on_board(r, c):
+    return 0 <= r < 8 and 0 <= c < 8
+
+def _attacks_by(piece, sq, occupied):
+    r, c = divmod(sq, 8)
+    attacked = set()
+    if piece == 'N':
+        for dr, dc in [(-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1)]:
+            if _on_board(r+dr, c+dc):
+                attacked.add((r+dr)*8 + c+dc)
+    else:
+        directions = []
+        if piece in ('B', 'Q'):
+            directions += [(-1,-1),(-1,1),(1,-1),(1,1)]
+        if piece in ('R', 'Q'):
+            directions += [(-1,0),(1,0),(0,-1),(0,1)]
+        for dr, dc in directions:
+            rr, cc = r+dr, c+dc
+            while _on_board(rr, cc):
+                s = rr*8 + cc
+                attacked.add(s)
+                if s in occupied:
+                    break
+                rr += dr; cc += dc
+    return attacked
+
+def _any_white_attacks(square, white_pieces, occupied):
+    return any(square in _attacks_by(p, sq, occupied) for p, sq in white_pieces)
+
+def _kings_adjacent(sq1, sq2):
+    r1, c1 = divmod(sq1, 8); r2, c2 = divmod(sq2, 8)
+    return max(abs(r1-r2), abs(c1-c2)) <= 1
+
+def _black_has_legal_king_move(bk, wk, white_pieces):
+    r, c = divmod(bk, 8)
+    for dr in (-1, 0, 1):
+        for dc in (-1, 0, 1):
+            if dr == 0 and dc == 0 or not _on_board(r+dr, c+dc):
+                continue
+            s = (r+dr)*8 + c+dc
+            if s == wk or _kings_adjacent(s, wk):
+                continue
+            # a captured piece no longer attacks or blocks
+            left = [(p, pos) for p, pos in white_pieces if pos != s]
+            if not _any_white_attacks(s, left, {wk} | {pos for _, pos in left}):
+                return True
+    return False
+
+def search_white_king_reference(bk, wk, p1, p2):
+    sols = []
+    for s1 in range(64):
+        if s1 == wk or s1 == bk: continue
+        for s2 in range(64):
+            if s2 == wk or s2 == s1 or s2 == bk: continue
+            white_pieces = [(p1, s1), (p2, s2)]
+            if _black_has_legal_king_move(bk, wk, white_pieces):
+                continue
+            in_check = _any_white_attacks(bk, white_pieces, {wk, s1, s2})
+            sols.append(pack(wk, s1, s2, bk, 'mate' if in_check else 'stalemate'))
+    return sols
+
+
+def load_engines():
+    engines = {'pruned': search_white_king, 'full': search_white_king_full,
+               'reference': search_white_king_reference}
+    try:
+        import vectorized
+    except ImportError:
+        pass
+    else:
+        engines['numpy'] = vectorized.search_white_king
+    return engines
+
+
+def run_square(engine, bk, p1, p2):
+    codes = array('I')
+    for wk in white_king_squares(bk):
+        codes.extend(engine(bk, wk, p1, p2))
+    return codes
+
+def summary(codes):
+    mates = sum(code & 1 for code in codes)
+    if sys.byteorder != 'little':
+        codes = array('I', codes)
+        codes.byteswap()
+    return [mates, len(codes) - mates, zlib.crc32(codes.tobytes())]
+
+def placements(bk):
+    # (wk, s1, s2) triples the search covers for one black king square
+    return len(white_king_squares(bk)) * 62 * 61
+
+
+def bench(engine, pairs, black_squares, memory=False):
+    # (results, seconds, peak bytes or None); results: "QR" -> {square: summary}
+    results = {}
+    if memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    for p1, p2 in pairs:
+        per_square = results.setdefault(p1 + p2, {})
+        for bk in black_squares:
+            per_square[sq_to_alg(bk)] = summary(run_square(engine, bk, p1, p2))
+    seconds = time.perf_counter() - t0
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return results, seconds, peak
+
+def compare(results, golden):
+    # "QR e8: ..." lines for every entry that differs from the golden file
+    diffs = []
+    for pair, per_square in results.items():
+        for square, got in per_square.items():
+            want = golden.get(pair, {}).get(square)
+            if want != got:
+                diffs.append(f"{pair} {square}: {got}, ожидалось {want}")
+    return diffs
+
+
+def main(argv=None):
+    engines = load_engines()
+    ap = argparse.ArgumentParser(description="Скорость и проверка движков поиска матов/патов")
+    ap.add_argument('--engine', choices=['pruned', 'full', 'reference', 'numpy'], action='append',
+                    help="движок (можно несколько; по умолчанию pruned, с --update — reference)")
+    ap.add_argument('--bk', type=parse_square, action='append',
+                    help="клетка чёрного короля (можно несколько; по умолчанию все 64)")
+    ap.add_argument('--pair', type=parse_pair, action='append',
+                    help="белые фигуры, например QR (можно несколько; по умолчанию все 10 пар)")
+    ap.add_argument('--memory', action='store_true',
+                    help="замерить пиковую память (tracemalloc замедляет поиск)")
+    ap.add_argument('--golden', default=GOLDEN_PATH)
+    ap.add_argument('--update', action='store_true',
+                    help="перезаписать эталон результатами (по умолчанию движка reference)")
+    args = ap.parse_args(argv)
+
+    pairs = args.pair or PAIRS
+    black_squares = args.bk or range(64)
+    total = len(pairs) * sum(placements(bk) for bk in black_squares)
+    golden = {}
+    if os.path.exists(args.golden):
+        with open(args.golden) as f:
+            golden = json.load(f)
+
+    failed = False
+    for name in args.engine or ['reference' if args.update else 'pruned']:
+        if name not in engines:
+            print(f"{name}: недоступен (нужен numpy)", file=sys.stderr)
+            failed = True
+            continue
+        results, seconds, peak = bench(engines[name], pairs, black_squares, args.memory)
+        line = f"{name:7} {total} позиций за {seconds:.2f} s, {total/seconds:,.0f} поз/с"
+        if peak is not None:
+            line += f", пик памяти {peak/2**20:.1f} МБ"
+        if args.update:
+            for pair, per_square in results.items():
+                golden.setdefault(pair, {}).update(per_square)
+            print(line)
+            continue
+        diffs = compare(results, golden)
+        print(f"{line}, {'РАСХОЖДЕНИЯ: ' + str(len(diffs)) if diffs else 'совпадает с эталоном'}")
+        for d in diffs[:20]:
+            print("  " + d)
+        failed = failed or bool(diffs)
+
+    if args.update:
+        # one line per pair keeps the diffs of the golden file readable
+        lines = [f"{json.dumps(pair)}: {json.dumps(golden[pair], sort_keys=True)}" for pair in sorted(golden)]
+        with open(args.golden, 'w') as f:
+            f.write("{\n" + ",\n".join(lines) + "\n}\n")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# Bitboard engine for the mate/stalemate search.
+# Squares are numbered sq = r*8 + c, row 0 is rank 8.
+# A board set is a 64-bit int with bit `sq` set for every square in it.
+
+FILES = "abcdefgh"
+RANKS = "87654321"  # row 0 -> rank 8, row 7 -> rank 1
+
+KING_DELTAS = [(-1,-1),(-1,0),(-1,1),(0,-1),(0,1),(1,-1),(1,0),(1,1)]
+KNIGHT_DELTAS = [(-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1)]
+BISHOP_DIRS = [(-1,-1),(-1,1),(1,-1),(1,1)]
+ROOK_DIRS = [(-1,0),(1,0),(0,-1),(0,1)]
+
+
+def sq_to_alg(sq):
+    r,c = divmod(sq, 8)
+    return FILES[c] + RANKS[r]
+
+def alg_to_sq(name):
+    if len(name) != 2 or name[0] not in FILES or name[1] not in RANKS:
+        raise ValueError(f"неверная клетка: {name!r}")
+    return RANKS.index(name[1])*8 + FILES.index(name[0])
+
+def bit(sq):
+    return 1 << sq
+
+def squares(mask):
+    out = []
+    while mask:
+        low = mask & -mask
+        out.append(low.bit_length() - 1)
+        mask ^= low
+    return out
+
+def _on_board(r,c):
+    return 0 <= r < 8 and 0 <= c < 8
+
+def _step_table(deltas):
+    table = []
+    for sq in range(64):
+        r,c = divmod(sq, 8)
+        m = 0
+        for dr,dc in deltas:
+            if _on_board(r+dr, c+dc):
+                m |= bit((r+dr)*8 + c+dc)
+        table.append(m)
+    return table
+
+def _ray(sq, dr, dc):
+    r,c = divmod(sq, 8)
+    m = 0
+    r += dr; c += dc
+    while _on_board(r,c):
+        m |= bit(r*8 + c)
+        r += dr; c += dc
+    return m
+
+def _slider_table(dirs):
+    return [sum(_ray(sq, dr, dc) for dr,dc in dirs) for sq in range(64)]
+
+def _behind_table():
+    # BEHIND[a][b]: squares on the line from a through b lying beyond b,
+    # i.e. what a slider on a loses when b is occupied (0 if not aligned)
+    table = [[0]*64 for _ in range(64)]
+    for a in range(64):
+        for dr,dc in BISHOP_DIRS + ROOK_DIRS:
+            for b in squares(_ray(a, dr, dc)):
+                table[a][b] = _ray(b, dr, dc)
+    return table
+
+def _between_table():
+    # BETWEEN[a][b]: squares strictly between two aligned squares (0 if not
+    # aligned), the ones that must be empty for a slider on a to reach b
+    table = [[0]*64 for _ in range(64)]
+    for a in range(64):
+        for dr,dc in BISHOP_DIRS + ROOK_DIRS:
+            ray = _ray(a, dr, dc)
+            for b in squares(ray):
+                table[a][b] = ray & ~_ray(b, dr, dc) & ~bit(b)
+    return table
+
+
+KNIGHT = _step_table(KNIGHT_DELTAS)
+KING = _step_table(KING_DELTAS)
+# king square plus its neighbours: where the other king may not stand
+KING_ZONE = [KING[sq] | bit(sq) for sq in range(64)]
+BEHIND = _behind_table()
+BETWEEN = _between_table()
+
+# attacks of each piece on an empty board
+EMPTY_ATTACKS = {
+    'N': KNIGHT,
+    'B': _slider_table(BISHOP_DIRS),
+    'R': _slider_table(ROOK_DIRS),
+    'Q': _slider_table(BISHOP_DIRS + ROOK_DIRS),
+    'K': KING,
+}
+
+
+def attacks(piece, sq, occ):
+    # cut every ray at its first blocker; the blocker itself stays attacked.
+    # BEHIND is 0 for knight/king targets, so leapers pass through unchanged
+    a = EMPTY_ATTACKS[piece][sq]
+    blockers = a & occ
+    behind = BEHIND[sq]
+    while blockers:
+        low = blockers & -blockers
+        a &= ~behind[low.bit_length() - 1]
+        blockers ^= low
+    return a
+
+def cover(white_pieces, occ):
+    m = 0
+    for p, sq in white_pieces:
+        m |= attacks(p, sq, occ)
+    return m
+
+def escape_squares(bk, wk):
+    return KING[bk] & ~KING_ZONE[wk]
+
+def pair_cover(wk, p1, s1, p2, s2):
+    # cover of two pieces that only block each other and the white king;
+    # with at most two blockers the cut is just the union of BEHIND masks
+    a1 = EMPTY_ATTACKS[p1][s1] & ~(BEHIND[s1][wk] | BEHIND[s1][s2])
+    a2 = EMPTY_ATTACKS[p2][s2] & ~(BEHIND[s2][wk] | BEHIND[s2][s1])
+    return a1 | a2
+
+def classify(bk, wk, p1, s1, p2, s2):
+    # a piece standing on an escape square is protected exactly when the
+    # other piece covers its square, so captures need no special handling
+    c = pair_cover(wk, p1, s1, p2, s2)
+    if escape_squares(bk, wk) & ~c:
+        return None
+    return 'mate' if c >> bk & 1 else 'stalemate'
+
+
+# The 8 symmetries of the board as square maps. Without pawns or castling
+# every position keeps its mate/stalemate status under all of them.
+def _transform_table():
+    maps = [
+        lambda r,c: (r, c),
+        lambda r,c: (r, 7-c),
+        lambda r,c: (7-r, c),
+        lambda r,c: (7-r, 7-c),
+        lambda r,c: (c, r),
+        lambda r,c: (7-c, 7-r),
+        lambda r,c: (c, 7-r),
+        lambda r,c: (7-c, r),
+    ]
+    return [[rr*8 + cc for rr,cc in (f(*divmod(sq, 8)) for sq in range(64))] for f in maps]
+
+TRANSFORMS = _transform_table()
+INVERSE_TRANSFORMS = [[m.index(sq) for sq in range(64)] for m in TRANSFORMS]
+# the a1-d1-d4 triangle: every square is the image of exactly one of these
+CANONICAL_SQUARES = [sq for sq in range(64) if sq % 8 <= 3 and sq // 8 + sq % 8 >= 7]
+# CANONICAL[sq] = (canonical square, transform t) with TRANSFORMS[t][canonical] == sq
+CANONICAL = [next((c, t) for c in CANONICAL_SQUARES for t in range(8) if TRANSFORMS[t][c] == sq)
+             for sq in range(64)]
@@ -0,0 +1,91 @@
+# Headless mate/stalemate search: streams solutions to stdout one per line.
+#
+#   python cli.py --bk e8 --pair QR              # NDJSON for one square
+#   python cli.py --format fen --type mate -j 8  # all squares, all pairs
+#
+# Lines are written as they are found, so memory stays flat on full sweeps.
+
+import argparse
+import json
+import os
+import sys
+
+from bitboard import sq_to_alg, alg_to_sq
+from search import PIECES, PAIRS, iter_sweep, unpack
+
+
+def to_record(code, p1, p2):
+    wk, s1, s2, bk, typ = unpack(code)
+    return {
+        'type': typ,
+        'black_king': sq_to_alg(bk),
+        'white_king': sq_to_alg(wk),
+        'p1': [p1, sq_to_alg(s1)],
+        'p2': [p2, sq_to_alg(s2)],
+    }
+
+def to_fen(code, p1, p2):
+    # black to move: the position is mate or stalemate for black
+    wk, s1, s2, bk, _ = unpack(code)
+    board = {wk: 'K', s1: p1, s2: p2, bk: 'k'}
+    rows = []
+    for r in range(8):
+        row = ''
+        empty = 0
+        for c in range(8):
+            piece = board.get(r*8 + c)
+            if piece is None:
+                empty += 1
+                continue
+            if empty:
+                row += str(empty)
+                empty = 0
+            row += piece
+        if empty:
+            row += str(empty)
+        rows.append(row)
+    return '/'.join(rows) + ' b - - 0 1'
+
+
+def parse_pair(text):
+    text = text.upper()
+    if len(text) != 2 or any(p not in PIECES for p in text):
+        raise argparse.ArgumentTypeError(f"пара фигур из {PIECES}, например QR: {text!r}")
+    return text[0], text[1]
+
+def parse_square(text):
+    try:
+        return alg_to_sq(text.lower())
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Поиск матов/патов K+X+Y против K без GUI")
+    ap.add_argument('--bk', type=parse_square, action='append',
+                    help="клетка чёрного короля (можно несколько; по умолчанию все 64)")
+    ap.add_argument('--pair', type=parse_pair, action='append',
+                    help="белые фигуры, например QR (можно несколько; по умолчанию все 10 пар)")
+    ap.add_argument('--format', choices=['ndjson', 'fen'], default='ndjson')
+    ap.add_argument('--type', choices=['all', 'mate', 'stalemate'], default='all')
+    ap.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args(argv)
+
+    pairs = args.pair or PAIRS
+    black_squares = args.bk or range(64)
+    fmt = to_fen if args.format == 'fen' else lambda code, p1, p2: json.dumps(to_record(code, p1, p2))
+    out = sys.stdout
+    try:
+        for p1, p2, code in iter_sweep(pairs, black_squares, args.workers):
+            if args.type != 'all' and (code & 1) != (args.type == 'mate'):
+                continue
+            out.write(fmt(code, p1, p2) + '\n')
+        out.flush()
+    except BrokenPipeError:
+        # reader went away (e.g. `| head`): silence the flush at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
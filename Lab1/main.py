@@ -1,9 +1,14 @@
+import threading
 import tkinter as tk
+from array import array
 from tkinter import ttk, messagebox
 
+from bitboard import FILES, RANKS, sq_to_alg
+from search import SolutionList, iter_shards, white_king_squares, cached_solution, remember_solution
+from tablebase import Tablebase
+from retro import load_pair
+
 BOARD_SIZE = 8
-FILES = "abcdefgh"
-RANKS = "87654321"  # row 0 -> rank 8, row 7 -> rank 1
 
 PIECE_SYMBOL = {
     'K': '♔',
@@ -14,6 +19,8 @@ PIECE_SYMBOL = {
     'N': '♘',
 }
 
+SEARCH_POLL_MS = 100  # how often the GUI picks up results of a background search
+
 WHITE_PIECES = ['Ферзь', 'Ладья', 'Слон', 'Конь']
 PIECE_SHORT = {'Ферзь':'Q','Ладья':'R','Слон':'B','Конь':'N'}
 
@@ -24,79 +31,49 @@ def rc_to_sq(r,c):
 def sq_to_rc(sq):
     return divmod(sq, 8)
 
-def sq_to_alg(sq):
-    r,c = sq_to_rc(sq)
-    return FILES[c] + RANKS[r]
-
 def on_board(r,c):
     return 0 <= r < 8 and 0 <= c < 8
 
-# generate attacked squares by a single white piece (ignoring 'turn' rules)
-def attacks_by(piece, sq, board):
-    r,c = sq_to_rc(sq)
-    attacked = set()
-    if piece == 'N':
-        for dr,dc in [(-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1)]:
-            rr,cc = r+dr, c+dc
-            if on_board(rr,cc):
-                attacked.add(rc_to_sq(rr,cc))
-    elif piece == 'B' or piece == 'R' or piece == 'Q':
-        directions = []
-        if piece in ('B','Q'):
-            directions += [(-1,-1),(-1,1),(1,-1),(1,1)]
-        if piece in ('R','Q'):
-            directions += [(-1,0),(1,0),(0,-1),(0,1)]
-        for dr,dc in directions:
-            rr,cc = r+dr, c+dc
-            while on_board(rr,cc):
-                s = rc_to_sq(rr,cc)
-                attacked.add(s)
-                # stop if any piece blocks further sliding
-                if s in board:
+
+class SearchJob:
+    # search for one black king square and piece pair on a worker thread;
+    # the Tk thread only reads `codes`, `done`, `complete` and `finished`
+    def __init__(self, bk, p1, p2, workers):
+        self.bk, self.p1, self.p2 = bk, p1, p2
+        self.workers = workers
+        self.codes = array('I')
+        self.done = 0
+        self.total = len(white_king_squares(bk))
+        self.complete = False  # every white king square searched
+        self.finished = False
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        shards = iter_shards([(self.p1, self.p2)], [self.bk], self.workers)
+        try:
+            for *_, codes in shards:
+                if self.cancelled.is_set():
                     break
-                rr += dr; cc += dc
-    return attacked
-
-
-def any_white_attacks(square, white_pieces, board):
-    for p, sq in white_pieces:
-        if square in attacks_by(p, sq, board):
-            return True
-    return False
-
-
-def kings_adjacent(sq1, sq2):
-    r1,c1 = sq_to_rc(sq1); r2,c2 = sq_to_rc(sq2)
-    return max(abs(r1-r2), abs(c1-c2)) <= 1
-
-
-def black_has_legal_king_move(bk_sq, white_pieces, board):
-    r,c = sq_to_rc(bk_sq)
-    for dr in (-1,0,1):
-        for dc in (-1,0,1):
-            if dr==0 and dc==0: continue
-            rr,cc = r+dr, c+dc
-            if not on_board(rr,cc): continue
-            s = rc_to_sq(rr,cc)
-            # can't move onto white king
-            if s == board.get('white_king_sq'):
-                continue
-            # kings can't be adjacent after move
-            if kings_adjacent(s, board.get('white_king_sq')):
-                continue
-            # capture consideration
-            new_white = [ (p,pos) for p,pos in white_pieces if pos != s ]
-            tmp_board = {}
-            tmp_board['white_king_sq'] = board.get('white_king_sq')
-            for p,pos in new_white:
-                tmp_board[pos] = p
-            if not any_white_attacks(s, new_white, tmp_board):
-                return True
-    return False
-
-
-def is_in_check(bk_sq, white_pieces, board):
-    return any_white_attacks(bk_sq, white_pieces, board)
+                self.codes.extend(codes)
+                self.done += 1
+            else:
+                self.complete = True
+        finally:
+            shards.close()
+            self.finished = True
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+def open_tablebase():
+    # the GUI falls back to searching when the tablebase was not generated
+    try:
+        return Tablebase()
+    except (OSError, ValueError):
+        return None
 
 #####################################
 # GUI / Search routine (manual black king placement, white pieces selected via dropdowns)
@@ -108,6 +85,9 @@ class MateFinderApp:
         self.selected_black = None
         self.solutions = []
         self.index = 0
+        self.tablebase = open_tablebase()
+        self.job = None
+        self.retro = {}  # (p1, p2) -> (RetroTable, swapped) or None
 
         top = ttk.Frame(root)
         top.pack(side='top', fill='x', padx=8, pady=6)
@@ -124,10 +104,19 @@ class MateFinderApp:
         ttk.Button(top, text="Найти комбинации", command=self.find_combinations).grid(row=0,column=4, padx=10)
         ttk.Button(top, text="Сбросить чёрного короля", command=self.reset_black).grid(row=0,column=5, padx=6)
 
+        # search processes (used only when there is no tablebase); one square
+        # takes a fraction of a second, less than starting a pool, so serial
+        # by default
+        ttk.Label(top, text="Процессов:").grid(row=0,column=6, sticky='w', padx=(12,0))
+        self.workers = tk.IntVar(value=1)
+        ttk.Spinbox(top, from_=1, to=64, width=4, textvariable=self.workers).grid(row=0,column=7)
+        ttk.Button(top, text="Остановить", command=self.stop_search).grid(row=0,column=8, padx=6)
+
         # board canvas
         self.canvas = tk.Canvas(root, width=8*60, height=8*60)
         self.canvas.pack(padx=8, pady=6)
         self.canvas.bind("<Button-1>", self.on_board_click)
+        self.create_board_items()
 
         # controls
         ctl = ttk.Frame(root)
@@ -144,14 +133,16 @@ class MateFinderApp:
         self.draw_board()
 
     def reset_black(self):
+        self.cancel_search()
         self.selected_black = None
         self.solutions = []
         self.index = 0
         self.status_label.config(text="Чёрный король сброшен. Поставьте его кликом по доске.")
         self.draw_board()
 
-    def draw_board(self, highlight=None, placement=None):
-        self.canvas.delete("all")
+    def create_board_items(self):
+        # every canvas item is created once; draw_board only moves, retexts
+        # and hides them, so stepping through solutions stays cheap
         size = 60
         for r in range(8):
             for c in range(8):
@@ -165,36 +156,44 @@ class MateFinderApp:
         for r in range(8):
             y = r*size + 3
             self.canvas.create_text(8, y, anchor='nw', text=RANKS[r], font=('Arial',8))
+        # frame around the chosen black square
+        self.highlight_item = self.canvas.create_rectangle(0,0,0,0, outline='red', width=3, state='hidden')
+        # white king, piece 1, piece 2, black king
+        self.piece_items = [self.canvas.create_text(0,0, font=('Arial',28), fill='black', state='hidden')
+                            for _ in range(4)]
+        self.drawn = {}  # item -> (text, square) currently shown, None if hidden
+
+    def place_item(self, item, text=None, sq=None):
+        # show text centred on sq, or hide the item when sq is None
+        state = None if sq is None else (text, sq)
+        if self.drawn.get(item) == state:
+            return
+        self.drawn[item] = state
+        if sq is None:
+            self.canvas.itemconfigure(item, state='hidden')
+            return
+        size = 60
+        r,c = sq_to_rc(sq)
+        if item == self.highlight_item:
+            x0 = c*size; y0 = r*size
+            self.canvas.coords(item, x0+2, y0+2, x0+size-2, y0+size-2)
+            self.canvas.itemconfigure(item, state='normal')
+        else:
+            self.canvas.coords(item, c*size + size/2, r*size + size/2)
+            self.canvas.itemconfigure(item, text=text, state='normal')
 
+    def draw_board(self, highlight=None, placement=None):
         # highlight chosen black square
-        if self.selected_black is not None:
-            r,c = sq_to_rc(self.selected_black)
-            x0 = c*size; y0 = r*size; x1 = x0+size; y1=y0+size
-            self.canvas.create_rectangle(x0+2,y0+2,x1-2,y1-2, outline='red', width=3)
+        self.place_item(self.highlight_item, sq=self.selected_black)
 
         # draw pieces from placement
         if placement:
-            def draw_piece(symbol, sq):
-                r,c = sq_to_rc(sq)
-                x = c*size + size/2
-                y = r*size + size/2
-                self.canvas.create_text(x,y, text=symbol, font=('Arial',28), fill='black')
-            # white king
-            wk = placement['white_king_sq']
-            draw_piece(PIECE_SYMBOL['K'], wk)
-            # white pieces
             p1,p2 = placement['p1'], placement['p2']
-            draw_piece(PIECE_SYMBOL[p1[0]], p1[1])
-            draw_piece(PIECE_SYMBOL[p2[0]], p2[1])
-            # black king
-            bk = placement['black_king_sq']
-            draw_piece(PIECE_SYMBOL['k'], bk)
+            shown = [('K', placement['white_king_sq']), p1, p2, ('k', placement['black_king_sq'])]
         else:
-            if self.selected_black is not None:
-                r,c = sq_to_rc(self.selected_black)
-                x = c*size + size/2
-                y = r*size + size/2
-                self.canvas.create_text(x,y, text=PIECE_SYMBOL['k'], font=('Arial',28), fill='black')
+            shown = [(None, None)]*3 + [('k', self.selected_black)]
+        for item, (piece, sq) in zip(self.piece_items, shown):
+            self.place_item(item, PIECE_SYMBOL.get(piece), sq)
 
     def on_board_click(self, event):
         size = 60
@@ -203,6 +202,7 @@ class MateFinderApp:
         if not on_board(r,c):
             return
         sq = rc_to_sq(r,c)
+        self.cancel_search()
         # first click (or any click) sets black king position
         self.selected_black = sq
         self.status_label.config(text=f"Чёрный король: {sq_to_alg(sq)}")
@@ -214,48 +214,105 @@ class MateFinderApp:
             return
         p1 = PIECE_SHORT[self.p1.get()]
         p2 = PIECE_SHORT[self.p2.get()]
-        self.status_label.config(text="Идёт поиск... (несколько секунд)")
-        self.root.update_idletasks()
         black_sq = self.selected_black
-        all_squares = [s for s in range(64) if s != black_sq]
-        sols = []
-        for wk in all_squares:
-            if kings_adjacent(wk, black_sq):
-                continue
-            for p1sq in all_squares:
-                if p1sq in (wk,): continue
-                for p2sq in all_squares:
-                    if p2sq in (wk,p1sq): continue
-                    board = {}
-                    board['white_king_sq'] = wk
-                    board[p1sq] = p1
-                    board[p2sq] = p2
-                    white_pieces = [(p1,p1sq),(p2,p2sq)]
-                    in_check = is_in_check(black_sq, white_pieces, board)
-                    has_move = black_has_legal_king_move(black_sq, white_pieces, board)
-                    if not has_move:
-                        typ = 'mate' if in_check else 'stalemate'
-                        sols.append({
-                            'white_king_sq': wk,
-                            'p1': (p1,p1sq),
-                            'p2': (p2,p2sq),
-                            'black_king_sq': black_sq,
-                            'type': typ
-                        })
-        self.solutions = sols
+        self.cancel_search()
         self.index = 0
-        self.status_label.config(text=f"Найдено {len(sols)} комбинаций ({self.p1.get()},{self.p2.get()}).")
-        if sols:
+        if self.tablebase is not None:
+            self.solutions = SolutionList(p1, p2, self.tablebase.lookup(black_sq, p1, p2))
+            self.finish_search()
+            return
+        cached = cached_solution(black_sq, p1, p2)
+        if cached is not None:
+            # this square or a symmetric one was searched earlier in the session
+            self.solutions = SolutionList(p1, p2, cached)
+            self.finish_search()
+            return
+        # no tablebase: search in the background, solutions become
+        # browsable as soon as the first white king squares are done
+        try:
+            workers = max(1, self.workers.get())
+        except tk.TclError:
+            workers = 1
+        self.solutions = SolutionList(p1, p2)
+        self.job = SearchJob(black_sq, p1, p2, workers)
+        self.status_label.config(text="Идёт поиск...")
+        self.draw_board()
+        self.root.after(SEARCH_POLL_MS, self.poll_search, self.job)
+
+    def poll_search(self, job):
+        if job is not self.job:
+            return  # the search was stopped or replaced by a newer one
+        had_solutions = bool(self.solutions)
+        self.solutions.extend(job.codes[len(self.solutions):])
+        if job.finished:
+            self.job = None
+            if job.complete:
+                remember_solution(job.bk, job.p1, job.p2, job.codes)
+            self.finish_search()
+            return
+        if self.solutions and not had_solutions:
             self.show_solution(0)
+        elif self.solutions:
+            # keep the browsed position, refresh "i/N" and the progress
+            self.status_label.config(text=self.describe(self.index))
         else:
+            self.status_label.config(text=self.progress_text())
+        self.root.after(SEARCH_POLL_MS, self.poll_search, job)
+
+    def progress_text(self):
+        job = self.job
+        return f"Поиск: {job.done}/{job.total} клеток белого короля, найдено {len(self.solutions)}"
+
+    def finish_search(self, stopped=False):
+        what = "Поиск остановлен" if stopped else "Найдено"
+        self.status_label.config(text=f"{what}: {len(self.solutions)} комбинаций ({self.p1.get()},{self.p2.get()}).")
+        if self.solutions and not stopped:
+            self.show_solution(0)
+        elif not self.solutions:
             self.draw_board()
 
+    def cancel_search(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+
+    def stop_search(self):
+        if self.job is None:
+            return
+        job = self.job
+        self.cancel_search()
+        # keep what was found so far
+        self.solutions.extend(job.codes[len(self.solutions):])
+        self.finish_search(stopped=True)
+
+    def describe(self, idx):
+        sol = self.solutions[idx]
+        desc = f"{idx+1}/{len(self.solutions)} — {sol['type'].upper()}: Black {sq_to_alg(sol['black_king_sq'])}, WK {sq_to_alg(sol['white_king_sq'])}, {sol['p1'][0]}@{sq_to_alg(sol['p1'][1])}, {sol['p2'][0]}@{sq_to_alg(sol['p2'][1])}"
+        if sol['type'] == 'stalemate':
+            desc += self.describe_white_to_move(sol)
+        if self.job is not None:
+            desc = f"{self.progress_text()} | {desc}"
+        return desc
+
+    def describe_white_to_move(self, sol):
+        # stalemates are legal with white to move too: how fast is the mate then
+        pair = (sol['p1'][0], sol['p2'][0])
+        if pair not in self.retro:
+            self.retro[pair] = load_pair(*pair)
+        if self.retro[pair] is None:
+            return ""
+        table, swapped = self.retro[pair]
+        sqs = [sol['p1'][1], sol['p2'][1]]
+        if swapped:
+            sqs.reverse()
+        n = table.mate_in(sol['white_king_sq'], sqs, sol['black_king_sq'], True)
+        return " — ход белых: " + ("ничья" if n is None else f"мат в {n}")
+
     def show_solution(self, idx):
         if not (0 <= idx < len(self.solutions)):
             return
         sol = self.solutions[idx]
-        desc = f"{idx+1}/{len(self.solutions)} — {sol['type'].upper()}: Black {sq_to_alg(sol['black_king_sq'])}, WK {sq_to_alg(sol['white_king_sq'])}, {sol['p1'][0]}@{sq_to_alg(sol['p1'][1])}, {sol['p2'][0]}@{sq_to_alg(sol['p2'][1])}"
-        self.status_label.config(text=desc)
+        self.status_label.config(text=self.describe(idx))
         self.draw_board(highlight=sol['black_king_sq'], placement=sol)
 
     def prev_solution(self):
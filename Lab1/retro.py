@@ -0,0 +1,324 @@
+# Retrograde analysis: distance to mate for K+X+Y vs K (and K+X vs K, which
+# a capture leads to), for both sides to move.
+#
+# Positions are reduced by the board symmetries (black king in the a1-d1-d4
+# triangle, the smaller of the two mirror images when it is on a1-h8) and
+# indexed as ((class(bk)*64 + wk)*64 + s1)*64 + s2, so each table is a
+# bytearray of 10*64**(n+1) entries:
+#   white[i] = n > 0  white to move mates in n moves
+#   black[i] = n > 0  black to move is mated after n-1 more white moves
+#                     (1 = already mate, as classify() reports it)
+# 0 is a draw, an illegal position or a non-canonical duplicate.
+#
+#   python retro.py QR            # build dtm_QR.bin next to main.py
+#   python retro.py all           # build all 10 pairs
+#   python retro.py "FEN"         # mate in N for a position (table must exist)
+
+import mmap
+import os
+import struct
+import sys
+import time
+from itertools import product
+
+from bitboard import (KING, KING_ZONE, EMPTY_ATTACKS, BETWEEN, TRANSFORMS, INVERSE_TRANSFORMS,
+                      CANONICAL, CANONICAL_SQUARES, RANKS, bit, squares, attacks)
+from search import PIECES, PAIRS
+
+MAGIC = b'KXYR'
+VERSION = 1
+TABLE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_HEADER = struct.Struct('<4sI2s')
+# the a1-h8 reflection keeps a1, b2, c3, d4 in place
+_MIRROR = TRANSFORMS[5]
+_ON_MIRROR = {sq for sq in CANONICAL_SQUARES if _MIRROR[sq] == sq}
+# per black king square: (class, square map into the triangle, the same map
+# followed by the a1-h8 reflection when that keeps the king in place)
+_BK_CLASS = []
+for _c, _t in CANONICAL:
+    _m = INVERSE_TRANSFORMS[_t]
+    _BK_CLASS.append((CANONICAL_SQUARES.index(_c), _m, [_MIRROR[x] for x in _m] if _c in _ON_MIRROR else None))
+# two black king moves can only reach the same position class when the
+# white men all stand on one long diagonal (the axis of the symmetry)
+_DIAGONALS = [sum(bit(sq) for sq in range(64) if sq // 8 + sq % 8 == 7),
+              sum(bit(sq) for sq in range(64) if sq // 8 == sq % 8)]
+_NOT_LEGAL = 255  # black move counter of a position black cannot lose
+
+
+def table_path(pieces):
+    return os.path.join(TABLE_DIR, f"dtm_{''.join(pieces)}.bin")
+
+
+class RetroTable:
+    def __init__(self, pieces, white, black):
+        self.pieces = tuple(pieces)
+        self.white = white
+        self.black = black
+
+    def mate_in(self, wk, sqs, bk, white_to_move):
+        # moves white needs to mate, None for a draw or an illegal position;
+        # sqs follow self.pieces
+        if not _legal(self.pieces, wk, sqs, bk, white_to_move):
+            return None
+        i = _index(wk, sqs, bk)
+        if white_to_move:
+            return self.white[i] or None
+        return self.black[i] - 1 if self.black[i] else None
+
+    # --- persistence ---
+    def save(self, path=None):
+        path = path or table_path(self.pieces)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, ''.join(self.pieces).encode()))
+            f.write(self.white)
+            f.write(self.black)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, pieces, path=None):
+        path = path or table_path(pieces)
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, name = _HEADER.unpack_from(mm, 0)
+        size = _table_size(len(pieces))
+        if magic != MAGIC or version != VERSION or name != ''.join(pieces).encode() \
+                or len(mm) != _HEADER.size + 2*size:
+            mm.close()
+            raise ValueError(f"{path}: не таблица {''.join(pieces)} версии {VERSION}")
+        view = memoryview(mm)
+        return cls(pieces, view[_HEADER.size:_HEADER.size + size], view[_HEADER.size + size:])
+
+
+def _table_size(n):
+    return len(CANONICAL_SQUARES) * 64**(n + 1)
+
+def _index(wk, sqs, bk):
+    # of two mirror images the one with the smaller index is kept
+    ci, m, alt = _BK_CLASS[bk]
+    i = ci*64 + m[wk]
+    for s in sqs:
+        i = i*64 + m[s]
+    if alt:
+        j = ci*64 + alt[wk]
+        for s in sqs:
+            j = j*64 + alt[s]
+        if j < i:
+            return j
+    return i
+
+def _decode(i, n):
+    sqs = []
+    for _ in range(n):
+        i, s = divmod(i, 64)
+        sqs.append(s)
+    ci, wk = divmod(i, 64)
+    return wk, sqs[::-1], CANONICAL_SQUARES[ci]
+
+def _cover(pieces, wk, sqs):
+    occ = bit(wk)
+    for s in sqs:
+        occ |= bit(s)
+    m = 0
+    for p, s in zip(pieces, sqs):
+        m |= attacks(p, s, occ)
+    return m
+
+def _open_lines(pieces, sqs, bk, occ, skip=None):
+    # squares a white man has to land on so that no other piece checks the
+    # black king through `occ`: the intersection of the open lines
+    need = (1 << 64) - 1
+    for j, (p, s) in enumerate(zip(pieces, sqs)):
+        if j != skip and EMPTY_ATTACKS[p][s] >> bk & 1 and not BETWEEN[s][bk] & occ:
+            need &= BETWEEN[s][bk]
+    return need
+
+def _gives_check(pieces, wk, sqs, bk):
+    occ = bit(wk)
+    for s in sqs:
+        occ |= bit(s)
+    for p, s in zip(pieces, sqs):
+        if EMPTY_ATTACKS[p][s] >> bk & 1 and not BETWEEN[s][bk] & occ:
+            return True
+    return False
+
+def _legal(pieces, wk, sqs, bk, white_to_move):
+    taken = {wk, bk, *sqs}
+    if len(taken) != len(sqs) + 2 or KING_ZONE[wk] >> bk & 1:
+        return False
+    # with white to move black may not stand in check
+    return not (white_to_move and _gives_check(pieces, wk, sqs, bk))
+
+
+def build(pieces, sub_tables=None, progress=None):
+    # sub_tables: piece tuple -> RetroTable for every position one capture
+    # away; missing ones count as draws (K+B, K+N and bare kings).
+    # progress(stage, done, total) is called during the initial scan
+    # ('scan', positions) and once per layer ('layer', layer, new positions)
+    pieces = tuple(pieces)
+    sub_tables = sub_tables or {}
+    n = len(pieces)
+    size = _table_size(n)
+    white = bytearray(size)
+    black = bytearray(size)
+    count = bytearray(size)   # black moves not yet known to lose
+    pending = {}              # white dtm after a capture -> positions to count down
+    frontier = []
+
+    # black to move: mates, draws and the number of moves to refute;
+    # product() walks (bk, wk, s1, ...) in index order
+    for i, (bk, wk, *sqs) in enumerate(product(CANONICAL_SQUARES, *[range(64)]*(n + 1))):
+        if progress and i % 65536 == 0:
+            progress('scan', i, size)
+        if KING_ZONE[wk] >> bk & 1 or len({wk, bk, *sqs}) != n + 2:
+            continue
+        if bk in _ON_MIRROR and _index(wk, sqs, bk) != i:
+            continue
+        cov = _cover(pieces, wk, sqs)
+        moves = KING[bk] & ~KING_ZONE[wk] & ~cov
+        if not moves:
+            if cov >> bk & 1:
+                black[i] = 1
+                frontier.append(i)
+            else:
+                count[i] = _NOT_LEGAL
+            continue
+        white_men = bit(wk)
+        for s in sqs:
+            white_men |= bit(s)
+        quiet = moves & ~white_men
+        if white_men & ~_DIAGONALS[0] and white_men & ~_DIAGONALS[1]:
+            c = bin(quiet).count('1')
+        else:
+            c = len({_index(wk, sqs, q) for q in squares(quiet)})
+        for q in squares(moves & white_men):
+            j = sqs.index(q)
+            rest = pieces[:j] + pieces[j+1:]
+            sub = sub_tables.get(rest)
+            d = sub.white[_index(wk, sqs[:j] + sqs[j+1:], q)] if sub else 0
+            if not d:
+                c = _NOT_LEGAL
+                break
+            pending.setdefault(d, []).append(i)
+            c += 1
+        count[i] = c
+
+    # layer by layer: white wins in `layer` from positions before a mated-in
+    # (layer-1) black position; black loses once every move is refuted
+    # A white move keeps the black king in place, so away from the mirror
+    # diagonal the position before it is just the index with one digit changed.
+    stride = [64**(n - j - 1) for j in range(n)]
+    layer = 0
+    while frontier or pending:
+        layer += 1
+        won = []
+        for b in frontier:
+            wk, sqs, bk = _decode(b, n)
+            occ = bit(wk) | bit(bk)
+            for s in sqs:
+                occ |= bit(s)
+            tie = bk in _ON_MIRROR
+            befores = []
+            # the king came from a square next to wk that leaves no check open
+            came = KING[wk] & ~KING_ZONE[bk] & ~occ & _open_lines(pieces, sqs, bk, occ & ~bit(wk))
+            for q in squares(came):
+                befores.append(_index(q, sqs, bk) if tie else b + (q - wk)*64**n)
+            # a piece came from a square it reaches now, not giving check from
+            # there and not uncovering a check by the other piece
+            for j, (p, s) in enumerate(zip(pieces, sqs)):
+                rest = occ & ~bit(s)
+                came = attacks(p, s, occ) & ~occ & ~attacks(p, bk, rest) & _open_lines(pieces, sqs, bk, rest, j)
+                for q in squares(came):
+                    befores.append(_index(wk, sqs[:j] + [q] + sqs[j+1:], bk) if tie else b + (q - s)*stride[j])
+            for w in befores:
+                if not white[w]:
+                    white[w] = layer
+                    won.append(w)
+        refuted = pending.pop(layer, [])
+        for w in won:
+            wk, sqs, bk = _decode(w, n)
+            occ = bit(wk)
+            for s in sqs:
+                occ |= bit(s)
+            refuted.extend({_index(wk, sqs, q) for q in squares(KING[bk] & ~KING_ZONE[wk] & ~occ)})
+        if progress:
+            progress('layer', layer, len(won))
+        frontier = []
+        for b in refuted:
+            c = count[b]
+            if c == 0 or c == _NOT_LEGAL or black[b]:
+                continue
+            count[b] = c - 1
+            if c == 1:
+                black[b] = layer + 1
+                frontier.append(b)
+    return RetroTable(pieces, white, black)
+
+
+def build_pair(p1, p2, progress=None):
+    subs = {}
+    for p in {p1, p2}:
+        if p in 'QR':
+            subs[(p,)] = build((p,))
+    return build((p1, p2), subs, progress)
+
+
+def load_pair(p1, p2):
+    # (table, swapped) for an ordered pair, or None if it was not built
+    swapped = (p1, p2) not in PAIRS
+    pieces = (p2, p1) if swapped else (p1, p2)
+    try:
+        return RetroTable.load(pieces), swapped
+    except (OSError, ValueError):
+        return None
+
+
+def parse_fen(fen):
+    # K+X+Y vs K positions only: (wk, [(piece, sq), ...], bk, white_to_move)
+    parts = fen.split()
+    wk = bk = None
+    men = []
+    for r, row in enumerate(parts[0].split('/')):
+        c = 0
+        for ch in row:
+            if ch.isdigit():
+                c += int(ch)
+                continue
+            sq = r*8 + c
+            if ch == 'K': wk = sq
+            elif ch == 'k': bk = sq
+            elif ch in PIECES: men.append((ch, sq))
+            else: raise ValueError(f"фигура {ch!r} не поддерживается")
+            c += 1
+    if wk is None or bk is None or len(men) != 2 or len(parts[0].split('/')) != len(RANKS):
+        raise ValueError("нужна позиция K+X+Y против K")
+    return wk, men, bk, len(parts) < 2 or parts[1] == 'w'
+
+
+if __name__ == "__main__":
+    arg = sys.argv[1] if len(sys.argv) > 1 else ''
+    if arg == 'all' or len(arg) == 2 and all(p in PIECES for p in arg.upper()):
+        pairs = PAIRS if arg == 'all' else [tuple(sorted(arg.upper(), key=PIECES.index))]
+        for p1, p2 in pairs:
+            t0 = time.time()
+            def report(stage, done, total):
+                if stage == 'scan':
+                    print(f"\r{p1}{p2}: разбор позиций {done*100//total}%", end='', file=sys.stderr, flush=True)
+                else:
+                    print(f"\r{p1}{p2}: мат в {done} — {total} позиций    ", end='', file=sys.stderr, flush=True)
+            table = build_pair(p1, p2, report)
+            table.save()
+            print(f"\r{table_path(table.pieces)}: самый долгий мат — в {max(table.white)} ходов "
+                  f"({time.time()-t0:.0f} s)", file=sys.stderr)
+    elif arg:
+        wk, men, bk, white_to_move = parse_fen(' '.join(sys.argv[1:]))
+        (p1, s1), (p2, s2) = men
+        loaded = load_pair(p1, p2)
+        if loaded is None:
+            sys.exit(f"нет таблицы, сначала: python retro.py {p1}{p2}")
+        table, swapped = loaded
+        n = table.mate_in(wk, [s2, s1] if swapped else [s1, s2], bk, white_to_move)
+        print("ничья или позиция невозможна" if n is None else f"мат в {n}")
+    else:
+        sys.exit("использование: python retro.py QR | python retro.py \"FEN\"")
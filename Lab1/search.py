@@ -0,0 +1,239 @@
+# GUI-independent mate/stalemate search over K+X+Y vs K placements.
+#
+# A solution is packed into one int so it can be stored in arrays and files:
+#   bit 0      1 = mate, 0 = stalemate
+#   bits 1-6   black king square
+#   bits 7-12  square of piece 2
+#   bits 13-18 square of piece 1
+#   bits 19-24 white king square
+# For a fixed black king, sorting codes gives the (wk, p1sq, p2sq) order
+# that the search loops produce.
+#
+# Only the 10 canonical black king squares are ever searched; the rest are
+# mapped from them with a board symmetry and re-sorted.
+#
+# With workers > 1 the search is sharded by white king square over a process
+# pool; shards are merged in white king order, so the result is identical.
+#
+# iter_solutions/iter_sweep stream codes shard by shard in that same order.
+# Each canonical shard is still searched once: it is kept only until every
+# requested black king square of its symmetry orbit has been served from it.
+
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import (KING_ZONE, EMPTY_ATTACKS, TRANSFORMS, INVERSE_TRANSFORMS, CANONICAL, CANONICAL_SQUARES,
+                      bit, squares, escape_squares, classify)
+
+PIECES = 'QRBN'
+# the 10 unordered piece pairs, in the order the tablebase stores them
+PAIRS = [(a, b) for i, a in enumerate(PIECES) for b in PIECES[i:]]
+
+
+def pack(wk, s1, s2, bk, typ):
+    return (((wk*64 + s1)*64 + s2)*64 + bk)*2 + (typ == 'mate')
+
+def unpack(code):
+    typ = 'mate' if code & 1 else 'stalemate'
+    code >>= 1
+    bk = code & 63; code >>= 6
+    s2 = code & 63; code >>= 6
+    s1 = code & 63
+    wk = code >> 6
+    return wk, s1, s2, bk, typ
+
+def solution_dict(code, p1, p2):
+    wk, s1, s2, bk, typ = unpack(code)
+    return {
+        'white_king_sq': wk,
+        'p1': (p1,s1),
+        'p2': (p2,s2),
+        'black_king_sq': bk,
+        'type': typ
+    }
+
+def swap_pieces(code):
+    # the same position with piece 1 and piece 2 exchanged
+    wk, s1, s2, bk, typ = unpack(code)
+    return pack(wk, s2, s1, bk, typ)
+
+def transform_codes(codes, t):
+    if t == 0:
+        return list(codes)
+    m = TRANSFORMS[t]
+    out = []
+    for code in codes:
+        wk, s1, s2, bk, typ = unpack(code)
+        out.append(pack(m[wk], m[s1], m[s2], m[bk], typ))
+    out.sort()
+    return out
+
+
+class SolutionList:
+    # solutions of one piece pair kept as packed codes, 4 bytes each;
+    # indexing unpacks a single entry into the dict the GUI works with
+    def __init__(self, p1, p2, codes=()):
+        self.p1, self.p2 = p1, p2
+        self.codes = array('I', codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, idx):
+        return solution_dict(self.codes[idx], self.p1, self.p2)
+
+    def extend(self, codes):
+        self.codes.extend(codes)
+
+
+def solve(bk, p1, p2, workers=1):
+    c, t = CANONICAL[bk]
+    return transform_codes(solve_canonical(c, p1, p2, workers), t)
+
+def iter_solutions(bk, p1, p2, workers=1):
+    for _, _, code in iter_sweep([(p1, p2)], [bk], workers):
+        yield code
+
+def iter_sweep(pairs, black_squares, workers=1):
+    # (p1, p2, code) for every pair and black king square, in solve() order
+    for p1, p2, _, _, codes in iter_shards(pairs, black_squares, workers):
+        for code in codes:
+            yield p1, p2, code
+
+def iter_shards(pairs, black_squares, workers=1):
+    # (p1, p2, bk, wk, codes) per white king square. Each shard runs on the
+    # canonical square with the white king mapped back, so the shards still
+    # come out in actual white king order. Black king squares of one orbit
+    # share their canonical shards: a shard is searched the first time it is
+    # needed and dropped after its last use.
+    tasks = []  # distinct canonical shards, in order of first use
+    keys = []
+    uses = {}
+    for p1, p2 in pairs:
+        for bk in black_squares:
+            c, t = CANONICAL[bk]
+            inv = INVERSE_TRANSFORMS[t]
+            for wk in white_king_squares(bk):
+                task = (c, inv[wk], p1, p2)
+                if task not in uses:
+                    uses[task] = 0
+                    tasks.append(task)
+                uses[task] += 1
+                keys.append((p1, p2, bk, wk, t, task))
+    shards = _run_shards(tasks, workers)
+    kept = {}
+    try:
+        for p1, p2, bk, wk, t, task in keys:
+            if task not in kept:
+                kept[task] = array('I', next(shards))
+            part = kept[task]
+            uses[task] -= 1
+            if not uses[task]:
+                del kept[task]
+            yield p1, p2, bk, wk, transform_codes(part, t)
+    finally:
+        shards.close()
+
+_canonical_cache = {}
+# _INVERSE[t]: index of the transform that undoes TRANSFORMS[t]
+_INVERSE = [TRANSFORMS.index(m) for m in INVERSE_TRANSFORMS]
+
+def solve_canonical(bk, p1, p2, workers=1):
+    key = (bk, p1, p2)
+    if key not in _canonical_cache:
+        _canonical_cache[key] = array('I', search_square(bk, p1, p2, workers))
+    return _canonical_cache[key]
+
+def cached_solution(bk, p1, p2):
+    # codes for bk in solve() order if its orbit was already searched, else None
+    c, t = CANONICAL[bk]
+    codes = _canonical_cache.get((c, p1, p2))
+    return None if codes is None else transform_codes(codes, t)
+
+def remember_solution(bk, p1, p2, codes):
+    # store a complete search of bk (in solve() order) for its whole orbit
+    c, t = CANONICAL[bk]
+    _canonical_cache[(c, p1, p2)] = array('I', transform_codes(codes, _INVERSE[t]))
+
+
+def white_king_squares(bk):
+    return [wk for wk in range(64) if not KING_ZONE[bk] >> wk & 1]
+
+def search_white_king(bk, wk, p1, p2):
+    # Piece 2 can only shorten the rays of piece 1, so every escape square
+    # piece 1 misses on an empty board has to be covered by piece 2. The
+    # squares piece 2 attacks x from are its own attacks from x, so the
+    # candidates for piece 2 are the intersection over those squares.
+    sols = []
+    escapes = escape_squares(bk, wk)
+    attacks1 = EMPTY_ATTACKS[p1]
+    attacks2 = EMPTY_ATTACKS[p2]
+    free = ((1 << 64) - 1) & ~bit(wk) & ~bit(bk)
+    for s1 in squares(free):
+        cand = free & ~bit(s1)
+        rest = escapes & ~attacks1[s1]
+        while rest and cand:
+            low = rest & -rest
+            cand &= attacks2[low.bit_length() - 1]
+            rest ^= low
+        for s2 in squares(cand):
+            typ = classify(bk, wk, p1, s1, p2, s2)
+            if typ:
+                sols.append(pack(wk, s1, s2, bk, typ))
+    return sols
+
+def search_white_king_full(bk, wk, p1, p2):
+    # reference: classify every placement
+    sols = []
+    for s1 in range(64):
+        if s1 == wk or s1 == bk: continue
+        for s2 in range(64):
+            if s2 == wk or s2 == s1 or s2 == bk: continue
+            typ = classify(bk, wk, p1, s1, p2, s2)
+            if typ:
+                sols.append(pack(wk, s1, s2, bk, typ))
+    return sols
+
+def _search_shard(task):
+    return search_white_king(*task)
+
+def _pool_context():
+    # the GUI starts pools from a worker thread, and forking a threaded
+    # process can deadlock the child; forkserver/spawn start clean processes
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+def _run_shards(tasks, workers):
+    # shard results in task order; executor.map keeps the input order
+    if workers <= 1:
+        return (_search_shard(task) for task in tasks)
+    pool = ProcessPoolExecutor(workers, mp_context=_pool_context())
+    return _drain(pool, pool.map(_search_shard, tasks, chunksize=max(1, len(tasks)//(workers*16))))
+
+def _drain(pool, results):
+    # closing the generator early (cancelled search) drops the queued shards
+    try:
+        yield from results
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def search_square(bk, p1, p2, workers=1):
+    tasks = [(bk, wk, p1, p2) for wk in white_king_squares(bk)]
+    sols = []
+    for part in _run_shards(tasks, workers):
+        sols.extend(part)
+    return sols
+
+def sweep_canonical(workers=1):
+    # (p1, p2, bk, codes) for every piece pair and canonical black king square,
+    # all sharded over one pool so the workers stay busy between squares
+    keys = [(p1, p2, bk) for p1, p2 in PAIRS for bk in CANONICAL_SQUARES]
+    tasks = [(bk, wk, p1, p2) for p1, p2, bk in keys for wk in white_king_squares(bk)]
+    parts = iter(_run_shards(tasks, workers))
+    for p1, p2, bk in keys:
+        sols = []
+        for _ in white_king_squares(bk):
+            sols.extend(next(parts))
+        yield p1, p2, bk, sols
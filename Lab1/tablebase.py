@@ -0,0 +1,97 @@
+# Precomputed mate/stalemate tablebase for every K+X+Y vs K piece pair.
+#
+# File layout (little-endian):
+#   header   magic, version u32, number of pairs u32
+#   index    per pair, per canonical black king square: first record u32, count u32
+#   records  u32 solution codes (see search.py), sorted within each entry
+#
+# The other 54 black king squares are served by a board symmetry.
+#
+# Build it once with `python tablebase.py [path]`. Tablebase maps the file
+# read-only, so opening it costs nothing and every query reads one entry.
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+from bitboard import CANONICAL, CANONICAL_SQUARES
+from search import PAIRS, sweep_canonical, swap_pieces, transform_codes
+
+MAGIC = b'KXYK'
+VERSION = 2
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tablebase.bin')
+
+_HEADER = struct.Struct('<4sII')
+_ENTRY = struct.Struct('<II')
+
+
+def build(path=DEFAULT_PATH, workers=1, progress=None):
+    index = array('I')
+    records = array('I')
+    total = len(PAIRS)*len(CANONICAL_SQUARES)
+    for done, (p1, p2, bk, sols) in enumerate(sweep_canonical(workers), 1):
+        index.extend((len(records), len(sols)))
+        records.extend(sols)
+        if progress:
+            progress(done, total)
+    if sys.byteorder != 'little':
+        index.byteswap()
+        records.byteswap()
+    # write next to the target and rename, so readers never see half a file
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(PAIRS)))
+        index.tofile(f)
+        records.tofile(f)
+    os.replace(tmp, path)
+
+
+class Tablebase:
+    def __init__(self, path=DEFAULT_PATH):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, npairs = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or npairs != len(PAIRS):
+            self._mm.close()
+            raise ValueError(f"{path}: не таблица версии {VERSION}")
+        self._data = _HEADER.size + npairs*len(CANONICAL_SQUARES)*_ENTRY.size
+
+    def close(self):
+        self._mm.close()
+
+    def lookup(self, bk, p1, p2):
+        # solution codes for (bk, p1, p2) in the order search.solve returns them
+        swapped = (p1, p2) not in PAIRS
+        pair_no = PAIRS.index((p2, p1) if swapped else (p1, p2))
+        c, t = CANONICAL[bk]
+        entry = pair_no*len(CANONICAL_SQUARES) + CANONICAL_SQUARES.index(c)
+        first, count = _ENTRY.unpack_from(self._mm, _HEADER.size + entry*_ENTRY.size)
+        start = self._data + first*4
+        codes = array('I')
+        codes.frombytes(self._mm[start:start + count*4])
+        if sys.byteorder != 'little':
+            codes.byteswap()
+        if swapped:
+            codes = map(swap_pieces, codes)
+        if t:
+            codes = array('I', transform_codes(codes, t))  # already sorted
+        elif swapped:
+            codes = array('I', sorted(codes))
+        return codes
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Построить таблицу матов/патов K+X+Y против K")
+    ap.add_argument('path', nargs='?', default=DEFAULT_PATH)
+    ap.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                    help="число процессов (по умолчанию — все ядра)")
+    args = ap.parse_args()
+    t0 = time.time()
+    def report(done, total):
+        print(f"\r{done}/{total} ({time.time()-t0:.0f} s)", end='', file=sys.stderr, flush=True)
+    build(args.path, args.workers, progress=report)
+    print(f"\n{args.path}: {os.path.getsize(args.path)} байт", file=sys.stderr)
@@ -0,0 +1,49 @@
+# NumPy batch evaluation: classify many placements with array operations
+# over the same bitboard tables as bitboard.classify. numpy is not required
+# by the rest of Lab1; only this module needs it.
+
+import numpy as np
+
+from bitboard import EMPTY_ATTACKS, BEHIND, escape_squares
+from search import pack
+
+_ATTACKS = {p: np.array(t, dtype=np.uint64) for p, t in EMPTY_ATTACKS.items()}
+_BEHIND = np.array(BEHIND, dtype=np.uint64)
+_ONE = np.uint64(1)
+
+
+def classify_batch(bk, wk, p1, s1, p2):
+    # (mate, stalemate): bool arrays indexed by the square of piece 2;
+    # squares taken by the kings or piece 1 are False in both
+    a1 = _ATTACKS[p1][s1] & ~(_BEHIND[s1, wk] | _BEHIND[s1])
+    a2 = _ATTACKS[p2] & ~(_BEHIND[:, wk] | _BEHIND[:, s1])
+    cover = a1 | a2
+    trapped = (np.uint64(escape_squares(bk, wk)) & ~cover) == 0
+    check = (cover >> np.uint64(bk)) & _ONE == _ONE
+    trapped[[wk, bk, s1]] = False
+    return trapped & check, trapped & ~check
+
+
+def classify_white_king(bk, wk, p1, p2):
+    # the same for every (piece 1, piece 2) pair at once: 64x64 arrays
+    # indexed [s1, s2]
+    a1 = _ATTACKS[p1][:, None] & ~(_BEHIND[:, wk][:, None] | _BEHIND)
+    a2 = _ATTACKS[p2][None, :] & ~(_BEHIND[:, wk][None, :] | _BEHIND.T)
+    cover = a1 | a2
+    trapped = (np.uint64(escape_squares(bk, wk)) & ~cover) == 0
+    check = (cover >> np.uint64(bk)) & _ONE == _ONE
+    np.fill_diagonal(trapped, False)
+    trapped[[wk, bk], :] = False
+    trapped[:, [wk, bk]] = False
+    return trapped & check, trapped & ~check
+
+
+def search_white_king(bk, wk, p1, p2):
+    # drop-in for search.search_white_king; np.nonzero walks [s1, s2] in
+    # row-major order, which is the order of the scalar loops
+    mate, stalemate = classify_white_king(bk, wk, p1, p2)
+    sols = []
+    for s1, s2 in zip(*np.nonzero(mate | stalemate)):
+        s1 = int(s1); s2 = int(s2)
+        sols.append(pack(wk, s1, s2, bk, 'mate' if mate[s1, s2] else 'stalemate'))
+    return sols
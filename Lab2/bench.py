@@ -0,0 +1,180 @@
+# Скорость и проверка движков перебора путей на одинаковых лабиринтах.
+#
+#   python bench.py                               # все семейства, размеры по умолчанию
+#   python bench.py --family open --size 5 --size 6
+#   python bench.py --engine walk --engine parallel --memory
+#
+# Семейства (для одного seed лабиринты всегда одни и те же):
+#   open     пустая сетка n×n, путь из угла в угол
+#   random   n×n, 30% стен, старт и финиш расчищены; сетки без пути
+#            пропускаются (берётся следующая из того же генератора)
+#   perfect  идеальный лабиринт n×n (maze.backtracker), ровно один путь
+# Движки:
+#   reference  прежний стек из MazeApp.solve (копии путей и множеств на каждом шаге)
+#   walk       paths.iter_paths — обход с маской посещённых
+#   by-length  paths.iter_paths_by_length — то, что сейчас делает «Решить»
+#   parallel   paths.all_paths_parallel
+#   count      paths.count_paths — только число путей
+# Узлы — шаги обхода вглубь (для reference — снятия со стека). Перебор
+# ограничен --seconds; если лимит сработал, число путей — нижняя граница.
+# На сетках до VERIFY_CELLS клеток пути каждого движка сверяются с
+# reference, на остальных — число путей с count_paths (в идеальном
+# лабиринте путь один по построению, там count_paths не нужен).
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import maze
+from paths import Budget, iter_paths, iter_paths_by_length, all_paths_parallel, count_paths, shortest_path
+
+FAMILIES = ['open', 'random', 'perfect']
+SIZES = {'open': [3, 4, 5, 6], 'random': [4, 6, 8, 10], 'perfect': [11, 21, 31, 41]}
+ENGINES = ['reference', 'walk', 'by-length', 'parallel', 'count']
+DEFAULT_ENGINES = ['reference', 'walk', 'by-length', 'count']
+WALLS = 0.3
+VERIFY_CELLS = 25
+
+
+def make_case(family, n, seed):
+    # (сетка — список строк 0/1, старт, финиш)
+    if family == 'perfect':
+        return maze.backtracker(n, n, seed).to_rows(), (0, 0), maze.last_room(n, n)
+    grid = [[0]*n for _ in range(n)]
+    if family == 'random':
+        rng = random.Random(seed)
+        while True:
+            grid = [[1 if rng.random() < WALLS else 0 for _ in range(n)] for _ in range(n)]
+            grid[0][0] = grid[n-1][n-1] = 0
+            if shortest_path(grid, (0, 0), (n-1, n-1)):
+                break
+    return grid, (0, 0), (n-1, n-1)
+
+
+def reference_paths(grid, start, end, budget):
+    # прежний MazeApp.solve без Tk: пути по длине; узлы пишутся в budget
+    rows, cols = len(grid), len(grid[0])
+    paths = []
+    stack = [(start, [start], {start})]
+    while stack:
+        pos, path, visited = stack.pop()
+        budget.nodes += 1
+        if budget.nodes % Budget.CHECK_NODES == 0 and budget.spend(0):
+            break
+        if pos == end:
+            paths.append(list(path))
+            continue
+        r, c = pos
+        for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+            nr, nc = r+dr, c+dc
+            if 0 <= nr < rows and 0 <= nc < cols:
+                if grid[nr][nc] == 1: continue
+                if (nr, nc) in visited: continue
+                stack.append(((nr, nc), path+[(nr, nc)], visited | {(nr, nc)}))
+    paths.sort(key=len)
+    return paths
+
+
+def run_engine(name, grid, start, end, seconds, workers, keep):
+    # (пути или None, число путей, узлы или None, прервано ли по лимиту);
+    # пути сохраняются только при keep, иначе только считаются
+    budget = Budget(seconds)
+    if name == 'count':
+        return None, count_paths(grid, start, end), None, False
+    if name == 'reference':
+        source = reference_paths(grid, start, end, budget)
+    elif name == 'walk':
+        # порядок обхода; reference сортирует устойчиво, поэтому сверяем по длине
+        source = iter_paths(grid, start, end, budget=budget)
+        if keep:
+            source = sorted(source, key=len)
+    elif name == 'by-length':
+        source = iter_paths_by_length(grid, start, end, budget=budget)
+    else:
+        source = all_paths_parallel(grid, start, end, workers, budget=budget)
+    if keep:
+        paths = list(source)
+        n = len(paths)
+    else:
+        paths = None
+        n = sum(1 for _ in source)
+    if budget is None:
+        return paths, n, None, False
+    return paths, n, budget.nodes, budget.reason is not None
+
+
+def bench_case(family, n, seed, engines, seconds, workers, memory):
+    # строки отчёта и число расхождений для одного лабиринта
+    grid, start, end = make_case(family, n, seed)
+    verify = n*n <= VERIFY_CELLS
+    expected = reference_paths(grid, start, end, Budget()) if verify else None
+    lines = []
+    failed = 0
+    total = 1 if family == 'perfect' else None
+    for name in engines:
+        if memory:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        paths, count, nodes, cut = run_engine(name, grid, start, end, seconds, workers, verify)
+        elapsed = time.perf_counter() - t0
+        peak = None
+        if memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        line = f"{family:8} {n}×{n} {name:9} {count}{'+' if cut else ''} путей за {elapsed:.2f} s"
+        line += f", {count/elapsed:,.0f} путей/с" if elapsed > 0 else ""
+        if nodes is not None:
+            line += f", узлов {nodes}"
+        if peak is not None:
+            line += f", пик памяти {peak/2**20:.1f} МБ"
+        if cut:
+            line += " (лимит времени)"
+        elif verify:
+            ok = count == len(expected) if paths is None else paths == expected
+            line += ", совпадает с эталоном" if ok else ", РАСХОЖДЕНИЕ с эталоном"
+            failed += not ok
+        else:
+            if total is None:
+                total = count_paths(grid, start, end)
+            if count != total:
+                line += f", РАСХОЖДЕНИЕ: count_paths даёт {total}"
+                failed += 1
+        lines.append(line)
+    return lines, failed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Скорость и проверка движков перебора путей")
+    ap.add_argument('--family', choices=FAMILIES, action='append',
+                    help="семейство лабиринтов (можно несколько; по умолчанию все)")
+    ap.add_argument('--size', type=int, action='append',
+                    help="сторона сетки n (можно несколько; по умолчанию своя лестница для семейства)")
+    ap.add_argument('--engine', choices=ENGINES, action='append',
+                    help="движок (можно несколько; по умолчанию все, кроме parallel)")
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--seconds', type=float, default=10, help="лимит перебора на один запуск")
+    ap.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="процессов для parallel")
+    ap.add_argument('--memory', action='store_true',
+                    help="замерить пиковую память (tracemalloc замедляет перебор; "
+                         "память процессов parallel не учитывается)")
+    args = ap.parse_args(argv)
+
+    failed = 0
+    for family in args.family or FAMILIES:
+        for n in args.size or SIZES[family]:
+            lines, bad = bench_case(family, n, args.seed, args.engine or DEFAULT_ENGINES,
+                                    args.seconds, args.workers, args.memory)
+            for line in lines:
+                print(line, flush=True)
+            failed += bad
+    if failed:
+        print(f"Расхождений: {failed}", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
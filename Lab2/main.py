@@ -1,13 +1,25 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
+import functools
+import os
 import random
 import sys
+import threading
+
+from paths import (LazyPaths, PathStore, Budget, iter_paths_by_length, count_paths, shortest_path,
+                   k_shortest_paths, iter_paths_parallel, sort_by_length, IncrementalSolver)
+import maze
 
 # Параметры по умолчанию
 CELL_SIZE = 32
 DEFAULT_ROWS = 8
 DEFAULT_COLS = 10
-MAX_CELLS = 12
+MAX_CELLS = 30
+DEFAULT_K = 20
+PAGE_SIZE = 200  # сколько маршрутов подгружать за раз
+DEFAULT_SECONDS = 10  # лимит времени на «Решить»
+SOLVE_POLL_MS = 100
+LIVE_COUNT_MS = 300  # пауза после правки, после которой пересчитывается число путей
 
 # Цвета
 COLOR_EMPTY = "white"
@@ -17,6 +29,92 @@ COLOR_END = "red"
 COLOR_PATH = "yellow"
 COLOR_VISITED = "#DDEEFF"
 
+STOP_REASONS = {'time': "истекло время", 'nodes': "исчерпан лимит узлов", 'stop': "остановлен"}
+
+
+class SolveJob:
+    # перебор путей в рабочем потоке с бюджетом (см. paths.Budget); поток Tk
+    # только читает store, found, budget.nodes, budget.reason и finished.
+    # С workers пути перебирает пул процессов; они приходят не по длине,
+    # поэтому в store попадают разом, отсортированными, в конце перебора
+    def __init__(self, grid, start, end, seconds, nodes, workers=None):
+        self.store = PathStore()
+        self.found = 0
+        self.budget = Budget(seconds, nodes)
+        self.finished = False
+        self.thread = threading.Thread(target=self._run, args=(grid, start, end, workers), daemon=True)
+        self.thread.start()
+
+    def _run(self, grid, start, end, workers):
+        try:
+            if workers is None:
+                for path in iter_paths_by_length(grid, start, end, budget=self.budget):
+                    self.store.append(path)
+                    self.found += 1
+            else:
+                sort_by_length(self._counted(iter_paths_parallel(grid, start, end, workers, budget=self.budget)),
+                               self.store)
+        finally:
+            self.finished = True
+
+    def _counted(self, paths):
+        for path in paths:
+            self.found += 1
+            yield path
+
+    def cancel(self):
+        self.budget.stop()
+
+
+class CountJob:
+    # подсчёт путей в рабочем потоке с бюджетом: count(budget=...) —
+    # paths.count_paths или IncrementalSolver.count с готовыми аргументами.
+    # Поток Tk читает result (None, если бюджет исчерпан), budget и finished
+    # и по окончании вызывает done, если он задан
+    def __init__(self, count, seconds, nodes, done=None):
+        self.result = None
+        self.budget = Budget(seconds, nodes)
+        self.done = done
+        self.finished = False
+        self.thread = threading.Thread(target=self._run, args=(count,), daemon=True)
+        self.thread.start()
+
+    def _run(self, count):
+        try:
+            self.result = count(budget=self.budget)
+        finally:
+            self.finished = True
+
+    def cancel(self):
+        self.budget.stop()
+
+
+class MazeJob:
+    # большой лабиринт, который не рисуется: make() строит или читает его
+    # ((Grid, старт, финиш)), при save он сохраняется в файл, затем ищется
+    # кратчайший путь — всё в рабочем потоке. Поток Tk читает size, result
+    # (путь или None), error и finished
+    def __init__(self, make, save=None):
+        self.size = None
+        self.result = None
+        self.error = None
+        self.finished = False
+        self.thread = threading.Thread(target=self._run, args=(make, save), daemon=True)
+        self.thread.start()
+
+    def _run(self, make, save):
+        try:
+            grid, start, end = make()
+            self.size = grid.rows, grid.cols
+            if save:
+                maze.save(save, grid, start, end)
+            self.result = shortest_path(grid, start, end)
+        except (OSError, ValueError) as e:
+            self.error = e
+        finally:
+            self.finished = True
+
+
 class MazeApp(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -31,8 +129,21 @@ class MazeApp(tk.Tk):
         self.end = (self.rows-1, self.cols-1)
 
         # Результаты поиска
-        self.paths = []  # список путей (каждый путь — список координат)
+        self.paths = []  # маршруты (LazyPaths, см. paths.py); путь — список координат
         self.current_index = None
+        # Холст: прямоугольники клеток, их текущие цвета и клетки, окрашенные
+        # не по сетке (путь, старт, финиш)
+        self.rects = None
+        self.colors = None
+        self.shown = set()
+        self.load_pending = False  # подгрузка списка уже запланирована
+        self.list_limit = PAGE_SIZE  # сколько строк списка показывать
+        self.job = None  # SolveJob, пока идёт перебор
+        self.budget = None  # Budget закончившегося перебора
+        self.count_job = None  # CountJob, пока идёт подсчёт
+        self.maze_job = None  # MazeJob, пока строится большой лабиринт
+        self.solver = None  # IncrementalSolver, пока включён пересчёт при правке
+        self.live_pending = None  # after() отложенного подсчёта путей при правке
 
         self._build_ui()
         self._draw_grid()
@@ -63,6 +174,32 @@ class MazeApp(tk.Tk):
         self.cols_var = tk.IntVar(value=self.cols)
         ttk.Entry(left, textvariable=self.cols_var, width=4).grid(row=2, column=3, sticky="w")
         ttk.Button(left, text="Применить размер", command=self.apply_size).grid(row=3, column=0, columnspan=4, sticky="ew", pady=6)
+        ttk.Button(left, text="Только посчитать пути", command=self.count_only).grid(row=4, column=0, columnspan=4, sticky="ew")
+        ttk.Label(left, text="K:").grid(row=5, column=0, sticky="e")
+        self.k_var = tk.IntVar(value=DEFAULT_K)
+        ttk.Entry(left, textvariable=self.k_var, width=6).grid(row=5, column=1, sticky="w")
+        ttk.Button(left, text="K кратчайших", command=self.solve_k_shortest).grid(row=5, column=2, columnspan=2, pady=6, sticky="ew")
+        ttk.Label(left, text="Процессов:").grid(row=6, column=0, sticky="e")
+        self.workers_var = tk.IntVar(value=os.cpu_count() or 1)
+        ttk.Entry(left, textvariable=self.workers_var, width=6).grid(row=6, column=1, sticky="w")
+        ttk.Button(left, text="Все пути параллельно", command=self.solve_parallel).grid(row=6, column=2, columnspan=2, sticky="ew")
+        self.live_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(left, text="Пересчитывать кратчайший путь и число путей при правке",
+                        variable=self.live_var, command=self._live_update).grid(row=7, column=0, columnspan=4, sticky="w", pady=6)
+        ttk.Label(left, text="Генератор:").grid(row=8, column=0, sticky="e")
+        self.algo_var = tk.StringVar(value="backtracker")
+        ttk.Combobox(left, textvariable=self.algo_var, values=list(maze.GENERATORS),
+                     state="readonly", width=12).grid(row=8, column=1, sticky="w")
+        ttk.Button(left, text="Сгенерировать", command=self.generate).grid(row=8, column=2, columnspan=2, sticky="ew")
+        ttk.Button(left, text="Сохранить…", command=self.save_maze).grid(row=9, column=0, columnspan=2, pady=6, sticky="ew")
+        ttk.Button(left, text="Загрузить…", command=self.load_maze).grid(row=9, column=2, columnspan=2, pady=6, sticky="ew")
+        ttk.Label(left, text="Лимит, с:").grid(row=10, column=0, sticky="e")
+        self.seconds_var = tk.DoubleVar(value=DEFAULT_SECONDS)
+        ttk.Entry(left, textvariable=self.seconds_var, width=6).grid(row=10, column=1, sticky="w")
+        ttk.Label(left, text="узлов:").grid(row=10, column=2, sticky="e")
+        self.nodes_var = tk.IntVar(value=0)  # 0 — без лимита
+        ttk.Entry(left, textvariable=self.nodes_var, width=10).grid(row=10, column=3, sticky="w")
+        ttk.Button(left, text="Остановить поиск", command=self.stop_solve).grid(row=11, column=0, columnspan=4, pady=6, sticky="ew")
 
         # Правая часть: список путей и навигация
         right = ttk.Frame(self)
@@ -72,6 +209,10 @@ class MazeApp(tk.Tk):
         self.paths_list = tk.Listbox(right, width=30, height=20)
         self.paths_list.grid(row=1, column=0, sticky="nswe")
         self.paths_list.bind("<<ListboxSelect>>", self.on_list_select)
+        # список подгружается, когда его прокручивают до конца
+        self.paths_scroll = ttk.Scrollbar(right, orient="vertical", command=self.paths_list.yview)
+        self.paths_scroll.grid(row=1, column=1, sticky="ns")
+        self.paths_list.config(yscrollcommand=self._on_list_scroll)
 
         nav = ttk.Frame(right)
         nav.grid(row=2, column=0, pady=6, sticky="ew")
@@ -100,26 +241,47 @@ class MazeApp(tk.Tk):
 
     # --- Взаимодействие с canvas ---
     def _draw_grid(self):
-        self.canvas.delete('all')
-        self.rects = [[None]*self.cols for _ in range(self.rows)]
-        for r in range(self.rows):
-            for c in range(self.cols):
-                x0 = c*self.cell_size
-                y0 = r*self.cell_size
-                x1 = x0 + self.cell_size
-                y1 = y0 + self.cell_size
-                color = COLOR_EMPTY if self.grid[r][c] == 0 else COLOR_WALL
-                rect = self.canvas.create_rectangle(x0, y0, x1, y1, fill=color, outline='gray')
-                self.rects[r][c] = rect
-        # отрисовать старт/финиш поверх
-        self._color_cell(self.start, COLOR_START)
-        self._color_cell(self.end, COLOR_END)
+        # Прямоугольники создаются заново только при смене размера, иначе
+        # сверяются цвета всех клеток и перекрашиваются изменившиеся
+        if self.rects is None or len(self.rects) != self.rows or len(self.rects[0]) != self.cols:
+            self.canvas.delete('all')
+            self.rects = [[None]*self.cols for _ in range(self.rows)]
+            self.colors = [[None]*self.cols for _ in range(self.rows)]
+            for r in range(self.rows):
+                for c in range(self.cols):
+                    x0 = c*self.cell_size
+                    y0 = r*self.cell_size
+                    x1 = x0 + self.cell_size
+                    y1 = y0 + self.cell_size
+                    rect = self.canvas.create_rectangle(x0, y0, x1, y1, fill=COLOR_EMPTY, outline='gray')
+                    self.rects[r][c] = rect
+                    self.colors[r][c] = COLOR_EMPTY
+        self._repaint([(r, c) for r in range(self.rows) for c in range(self.cols)], ())
+
+    def _repaint(self, cells, path):
+        # привести цвета клеток cells к сетке и пути path (старт/финиш поверх)
+        on_path = set(path)
+        for pos in cells:
+            if pos == self.start:
+                color = COLOR_START
+            elif pos == self.end:
+                color = COLOR_END
+            elif pos in on_path:
+                color = COLOR_PATH
+            elif self.grid[pos[0]][pos[1]] == 1:
+                color = COLOR_WALL
+            else:
+                color = COLOR_EMPTY
+            self._color_cell(pos, color)
+        self.shown = on_path | {self.start, self.end}
 
     def _color_cell(self, pos, color, tag=None):
         r, c = pos
         if 0 <= r < self.rows and 0 <= c < self.cols:
             rect = self.rects[r][c]
-            self.canvas.itemconfig(rect, fill=color)
+            if self.colors[r][c] != color:
+                self.canvas.itemconfig(rect, fill=color)
+                self.colors[r][c] = color
             if tag:
                 self.canvas.addtag_withtag(tag, rect)
 
@@ -132,14 +294,17 @@ class MazeApp(tk.Tk):
         self.grid[r][c] = 0 if self.grid[r][c] == 1 else 1
         color = COLOR_EMPTY if self.grid[r][c] == 0 else COLOR_WALL
         self._color_cell((r,c), color)
+        self._live_update((r,c))
 
     def on_left_drag(self, event):
         # при перетаскивании ставим стены
         r, c = self._pixel_to_cell(event.x, event.y)
         if r is None: return
         if (r,c) == self.start or (r,c) == self.end: return
+        if self.grid[r][c] == 1: return
         self.grid[r][c] = 1
         self._color_cell((r,c), COLOR_WALL)
+        self._live_update((r,c))
 
     def on_right_click(self, event):
         r, c = self._pixel_to_cell(event.x, event.y)
@@ -173,7 +338,7 @@ class MazeApp(tk.Tk):
 
         # перерисовать сетку
         self._draw_grid()
-
+        self._live_update()
 
     def _pixel_to_cell(self, x, y):
         c = x // self.cell_size
@@ -184,6 +349,7 @@ class MazeApp(tk.Tk):
 
     # --- Управление лабиринтом ---
     def clear_grid(self):
+        self._cancel_solve()
         for r in range(self.rows):
             for c in range(self.cols):
                 self.grid[r][c] = 0
@@ -193,8 +359,10 @@ class MazeApp(tk.Tk):
         self.current_index = None
         self._draw_grid()
         self._update_paths_ui()
+        self._live_update()
 
     def randomize(self):
+        self._cancel_solve()
         for r in range(self.rows):
             for c in range(self.cols):
                 self.grid[r][c] = 1 if random.random() < 0.3 else 0
@@ -207,6 +375,7 @@ class MazeApp(tk.Tk):
         self.current_index = None
         self._draw_grid()
         self._update_paths_ui()
+        self._live_update()
 
     def apply_size(self):
         r = self.rows_var.get()
@@ -214,55 +383,222 @@ class MazeApp(tk.Tk):
         if r <= 0 or c <= 0 or r > MAX_CELLS or c > MAX_CELLS:
             messagebox.showwarning("Размер", f"Допустимый размер: 1..{MAX_CELLS} для строк и столбцов (рекомендуется меньше для поиска всех путей)")
             return
-        self.rows = r
-        self.cols = c
-        self.grid = [[0]*self.cols for _ in range(self.rows)]
-        self.start = (0,0)
-        self.end = (self.rows-1, self.cols-1)
+        self._set_grid([[0]*c for _ in range(r)], (0, 0), (r-1, c-1))
+
+    def _set_grid(self, grid, start, end):
+        # новый лабиринт в редакторе (список строк 0/1)
+        self._cancel_solve()
+        self.rows = len(grid)
+        self.cols = len(grid[0])
+        self.rows_var.set(self.rows)
+        self.cols_var.set(self.cols)
+        self.grid = grid
+        self.start = start
+        self.end = end
         # ресайз canvas
         self.canvas.config(width=self.cols*self.cell_size, height=self.rows*self.cell_size)
         self.paths = []
         self.current_index = None
         self._draw_grid()
         self._update_paths_ui()
+        self._live_update()
+
+    # --- Генерация и файлы (см. maze.py) ---
+    def generate(self):
+        # Идеальный лабиринт заданного размера. Больше MAX_CELLS на холст не
+        # поместится: такой сразу сохраняется в файл и решается без показа
+        try:
+            r = self.rows_var.get()
+            c = self.cols_var.get()
+        except tk.TclError:
+            r = c = 0
+        if r <= 0 or c <= 0:
+            messagebox.showwarning("Размер", "Строк и столбцов должно быть больше нуля")
+            return
+        generator = maze.GENERATORS[self.algo_var.get()]
+        end = maze.last_room(r, c)
+        if r <= MAX_CELLS and c <= MAX_CELLS:
+            self._set_grid(generator(r, c).to_rows(), (0, 0), end)
+            return
+        path = filedialog.asksaveasfilename(title="Сохранить лабиринт", defaultextension=".maze",
+                                            filetypes=[("Лабиринт", "*.maze"), ("Все файлы", "*")])
+        self._report_large(MazeJob(lambda: (generator(r, c), (0, 0), end), path))
+
+    def save_maze(self):
+        path = filedialog.asksaveasfilename(title="Сохранить лабиринт", defaultextension=".maze",
+                                            filetypes=[("Лабиринт", "*.maze"), ("Все файлы", "*")])
+        if path:
+            maze.save(path, self.grid, self.start, self.end)
+
+    def load_maze(self):
+        path = filedialog.askopenfilename(title="Загрузить лабиринт",
+                                          filetypes=[("Лабиринт", "*.maze"), ("Все файлы", "*")])
+        if not path:
+            return
+        try:
+            grid, start, end = maze.load(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Загрузка", str(e))
+            return
+        if grid.rows <= MAX_CELLS and grid.cols <= MAX_CELLS:
+            self._set_grid(grid.to_rows(), start, end)
+        else:
+            self._report_large(MazeJob(lambda: (grid, start, end)))
+
+    def _report_large(self, job):
+        # лабиринт, который не рисуется: только кратчайший путь по BFS, он
+        # ищется в рабочем потоке и показывается в строке «Всего путей»
+        self.maze_job = job
+        self.poll_maze(job)
+
+    def poll_maze(self, job):
+        if job is not self.maze_job:
+            return
+        if not job.finished:
+            self.count_label.config(text="Большой лабиринт: идёт построение и поиск кратчайшего пути…")
+            self.after(SOLVE_POLL_MS, self.poll_maze, job)
+            return
+        self.maze_job = None
+        if job.error is not None:
+            messagebox.showerror("Лабиринт", str(job.error))
+            return
+        rows, cols = job.size
+        length = f"кратчайший путь {len(job.result)} клеток" if job.result else "пути нет"
+        self.count_label.config(text=f"Лабиринт {rows}×{cols} — слишком велик для показа (больше {MAX_CELLS}), {length}")
+
+    def _live_update(self, cell=None):
+        # Пересчёт при правке: после переключения клетки решатель правит
+        # только затронутое (см. IncrementalSolver), иначе строится заново.
+        # Число путей считает CountJob через LIVE_COUNT_MS после последней
+        # правки, так что перетаскивание даёт один подсчёт
+        if not self.live_var.get():
+            self.solver = None
+            self._cancel_live()
+            return
+        self._cancel_solve()
+        if cell is None or self.solver is None:
+            self.solver = IncrementalSolver(self.grid, self.start, self.end)
+        else:
+            r, c = cell
+            self.solver.set_cell(r, c, self.grid[r][c])
+        self.paths = []
+        self.current_index = None
+        self._update_paths_ui()
+        path = self.solver.shortest_path()
+        if path:
+            self._draw_path(path)
+            self.current_label.config(text=f"Кратчайший: длина {len(path)}")
+        else:
+            self._draw_grid()
+            self.current_label.config(text="Кратчайший: пути нет")
+        self.count_label.config(text="Всего путей: …")
+        self.live_pending = self.after(LIVE_COUNT_MS, self._live_count)
+
+    def _live_count(self):
+        # динамика продолжается со строки над самой верхней правкой (см.
+        # IncrementalSolver); досчитанные строки решатель оставляет себе
+        self.live_pending = None
+        seconds, nodes = self._limits()
+        snapshot = self.solver.snapshot()
+        self.count_job = CountJob(functools.partial(self.solver.count, snapshot), seconds, nodes,
+                                  functools.partial(self.solver.keep, snapshot))
+        self.poll_count(self.count_job)
+
+    def _cancel_live(self):
+        if self.live_pending is not None:
+            self.after_cancel(self.live_pending)
+            self.live_pending = None
 
     # --- Поиск путей ---
-    def solve(self):
-        # Собираем все простые пути (без повторного посещения клеток) от start до end
+    def _check_ends(self):
         sr, sc = self.start
         er, ec = self.end
         if not (0 <= sr < self.rows and 0 <= sc < self.cols and 0 <= er < self.rows and 0 <= ec < self.cols):
             messagebox.showerror("Позиции", "Неправильно заданы старт/финиш")
-            return
+            return False
         if self.grid[sr][sc] == 1 or self.grid[er][ec] == 1:
             messagebox.showerror("Позиции", "Старт или финиш находятся в стене")
+            return False
+        return True
+
+    def solve(self, workers=None):
+        # Собираем все простые пути (без повторного посещения клеток) от start до end.
+        # Перебор идёт в рабочем потоке в пределах лимита времени и узлов;
+        # пути идут по длине (см. paths.py) и появляются в списке по мере
+        # нахождения, «Остановить поиск» оставляет уже найденные.
+        # С workers перебирает пул процессов (см. SolveJob)
+        if not self._check_ends():
             return
+        seconds, nodes = self._limits()
+        self._cancel_solve()
+        grid = [row[:] for row in self.grid]  # правки во время перебора его не касаются
+        self.job = SolveJob(grid, self.start, self.end, seconds, nodes, workers)
+        self.paths = self.job.store
+        self.current_index = None
+        self._update_paths_ui()
+        self.after(SOLVE_POLL_MS, self.poll_solve, self.job)
+
+    def _limits(self):
+        # (секунды, узлы) из полей лимита; None — без лимита
+        try:
+            seconds = self.seconds_var.get()
+        except tk.TclError:
+            seconds = DEFAULT_SECONDS
+        try:
+            nodes = self.nodes_var.get()
+        except tk.TclError:
+            nodes = 0
+        return seconds if seconds > 0 else None, nodes if nodes > 0 else None
+
+    def poll_solve(self, job):
+        # job — перебор, для которого запланирован опрос; если его уже
+        # сменил или отменил другой, опрос заканчивается
+        if job is not self.job:
+            return
+        if job.finished:
+            self.job = None
+            self.budget = job.budget
+        self._append_list_entries(self.paths_list.size())
+        if self.current_index is None and len(self.paths):
+            self.current_index = 0
+            self._show_path(0)
+        elif self.current_index is not None:
+            # обновить «#i / N»
+            self._show_path(self.current_index)
+        if self.job is not None:
+            self.after(SOLVE_POLL_MS, self.poll_solve, job)
+        elif not len(self.paths) and not job.budget.reason:
+            messagebox.showinfo("Результат", "Пути не найдены")
 
-        # Ограничение на размер (предупреждение)
-        total_cells = self.rows * self.cols
-        if total_cells > 100:
-            if not messagebox.askyesno("Внимание", "Поиск всех путей на большой сетке может занять много времени. Продолжить?"):
-                return
-
-        # Выполняем DFS итеративно, собирая все пути.
-        self.paths = []
-        stack = [ ( (sr,sc), [(sr,sc)], set([(sr,sc)]) ) ]  # (pos, path_list, visited_set)
-        while stack:
-            pos, path, visited = stack.pop()
-            if pos == (er,ec):
-                self.paths.append(list(path))
-                continue
-            r,c = pos
-            # соседи: вверх, вниз, влево, вправо
-            for dr,dc in [(-1,0),(1,0),(0,-1),(0,1)]:
-                nr, nc = r+dr, c+dc
-                if 0 <= nr < self.rows and 0 <= nc < self.cols:
-                    if self.grid[nr][nc] == 1: continue
-                    if (nr,nc) in visited: continue
-                    # отсечь пути, которые уже длиннее текущ известного кратчайшего (опция)
-                    stack.append( ( (nr,nc), path+[(nr,nc)], visited | {(nr,nc)} ) )
-        # После поиска — сортируем пути по длине
-        self.paths.sort(key=lambda p: len(p))
+    def stop_solve(self):
+        # найденные пути остаются; поток остановится на ближайшей проверке бюджета
+        if self.job is not None:
+            self.job.cancel()
+        if self.count_job is not None:
+            self.count_job.cancel()
+
+    def _cancel_solve(self):
+        # прервать перебор или подсчёт, чьи результаты больше не нужны
+        self._cancel_live()
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+        if self.count_job is not None:
+            self.count_job.cancel()
+            self.count_job = None
+        self.budget = None
+
+    def solve_parallel(self):
+        # То же, что «Решить», но перебирает пул процессов (см. paths.py):
+        # пути появляются в списке разом, в том же порядке, когда перебор
+        # закончится или будет остановлен
+        try:
+            workers = max(1, self.workers_var.get())
+        except tk.TclError:
+            workers = 1
+        self.solve(workers)
+
+    def _show_results(self):
         self.current_index = 0 if self.paths else None
         self._update_paths_ui()
         if self.current_index is not None:
@@ -270,16 +606,75 @@ class MazeApp(tk.Tk):
         else:
             messagebox.showinfo("Результат", "Пути не найдены")
 
+    def solve_k_shortest(self):
+        # Первые K маршрутов в том же порядке, что и после «Решить», но без
+        # перебора всех путей (алгоритм Йена, см. paths.py)
+        if not self._check_ends():
+            return
+        try:
+            k = self.k_var.get()
+        except tk.TclError:
+            k = 0
+        if k <= 0:
+            messagebox.showwarning("K", "K должно быть целым числом больше нуля")
+            return
+        self._cancel_solve()
+        self.paths = LazyPaths(k_shortest_paths(self.grid, self.start, self.end, k))
+        self.paths.fetch(PAGE_SIZE)
+        self._show_results()
+
+    def count_only(self):
+        # Только число путей: динамика по фронтиру (см. paths.py), сами пути
+        # не строятся, поэтому работает и там, где перебор невозможен.
+        # Считает рабочий поток в пределах тех же лимитов, что и «Решить»
+        # (узлы — обработанные состояния динамики)
+        if not self._check_ends():
+            return
+        seconds, nodes = self._limits()
+        self._cancel_solve()
+        self.paths = []
+        self.current_index = None
+        self._draw_grid()
+        self._update_paths_ui()
+        grid = [row[:] for row in self.grid]
+        self.count_job = CountJob(functools.partial(count_paths, grid, self.start, self.end), seconds, nodes)
+        self.poll_count(self.count_job, " (только подсчёт)")
+
+    def poll_count(self, job, note=""):
+        # note — приписка к готовому числу путей
+        if job is not self.count_job:
+            return
+        if not job.finished:
+            self.count_label.config(text=f"Идёт подсчёт: обработано состояний {job.budget.nodes}")
+            self.after(SOLVE_POLL_MS, self.poll_count, job, note)
+            return
+        self.count_job = None
+        if job.done is not None:
+            job.done()
+        if job.result is None:
+            self.count_label.config(text=f"Всего путей: — (подсчёт прерван: {STOP_REASONS[job.budget.reason]}, "
+                                         f"состояний {job.budget.nodes})")
+        else:
+            self.count_label.config(text=f"Всего путей: {job.result}{note}")
+
     def show_shortest(self):
-        if not self.paths:
-            messagebox.showinfo("Кратчайший", "Сначала выполните поиск (Решить)")
+        if self.paths:
+            # Кратчайший — первый в отсортированном списке
+            self.current_index = 0
+            self._show_path(self.current_index)
+            self.paths_list.selection_clear(0, tk.END)
+            self.paths_list.selection_set(0)
+            self.paths_list.see(0)
             return
-        # Кратчайший — первый в отсортированном списке
-        self.current_index = 0
-        self._show_path(self.current_index)
-        self.paths_list.selection_clear(0, tk.END)
-        self.paths_list.selection_set(0)
-        self.paths_list.see(0)
+        # Без перебора: BFS по сетке, тот же путь, что стоял бы первым в списке
+        if not self._check_ends():
+            return
+        path = shortest_path(self.grid, self.start, self.end)
+        if path is None:
+            messagebox.showinfo("Кратчайший", "Пути не найдены")
+            return
+        self._draw_path(path)
+        self.current_label.config(text=f"Кратчайший: длина {len(path)}")
 
     def show_prev(self):
         if self.current_index is None:
@@ -294,6 +689,8 @@ class MazeApp(tk.Tk):
     def show_next(self):
         if self.current_index is None:
             return
+        if self.current_index >= self.paths_list.size()-1:
+            self._load_more()
         if self.current_index < len(self.paths)-1:
             self.current_index += 1
             self._show_path(self.current_index)
@@ -303,6 +700,8 @@ class MazeApp(tk.Tk):
 
     def goto_index(self):
         idx = self.goto_var.get() - 1
+        if idx >= self.paths_list.size():
+            self._load_more(idx + 1)
         if idx < 0 or idx >= len(self.paths):
             messagebox.showwarning("Номер", "Неверный номер маршрута")
             return
@@ -320,25 +719,68 @@ class MazeApp(tk.Tk):
         self._show_path(idx)
 
     def _show_path(self, index):
-        # Снять выделение предыдущих путей
-        self._draw_grid()
         path = self.paths[index]
-        # подсветить путь
-        for (r,c) in path:
-            self._color_cell((r,c), COLOR_PATH)
-        # стилизовать старт/финиш
-        self._color_cell(self.start, COLOR_START)
-        self._color_cell(self.end, COLOR_END)
-        self.current_label.config(text=f"Текущий: #{index+1} / {len(self.paths)}, длина {len(path)}")
+        self._draw_path(path)
+        self.current_label.config(text=f"Текущий: #{index+1} / {self._total_text()}, длина {len(path)}")
+
+    def _draw_path(self, path):
+        # Перекрашиваются только клетки прежнего и нового пути (и старт/финиш,
+        # в том числе прежние), остальные прямоугольники не трогаются
+        cells = [(r, c) for r, c in self.shown | set(path) | {self.start, self.end}
+                 if 0 <= r < self.rows and 0 <= c < self.cols]
+        self._repaint(cells, path)
 
     def _update_paths_ui(self):
         self.paths_list.delete(0, tk.END)
-        for i,p in enumerate(self.paths):
-            self.paths_list.insert(tk.END, f"#{i+1}: длина {len(p)}")
-        self.count_label.config(text=f"Всего путей: {len(self.paths)}")
+        self.list_limit = PAGE_SIZE
+        self._append_list_entries(0)
         if self.current_index is None:
             self.current_label.config(text="Текущий: -")
-        
+
+    def _append_list_entries(self, first):
+        # строки списка для маршрутов начиная с first (остальные уже есть);
+        # в списке не больше list_limit строк, дальше — по прокрутке
+        for i in range(first, min(len(self.paths), self.list_limit)):
+            self.paths_list.insert(tk.END, f"#{i+1}: длина {self.paths.length(i)}")
+        self.count_label.config(text=self._count_text())
+
+    def _count_text(self):
+        n = len(self.paths)
+        if self.job is not None:
+            return f"Идёт поиск: найдено путей {self.job.found}, узлов {self.job.budget.nodes}"
+        if self.budget is not None and self.budget.reason:
+            return f"Найдено путей: {n} (поиск прерван: {STOP_REASONS[self.budget.reason]}, узлов {self.budget.nodes})"
+        if not getattr(self.paths, 'complete', True):
+            return f"Найдено путей: {n} (прокрутите список, чтобы загрузить ещё)"
+        return f"Всего путей: {n}"
+
+    def _total_text(self):
+        n = len(self.paths)
+        unfinished = (self.job is not None or self.budget is not None and self.budget.reason
+                      or not getattr(self.paths, 'complete', True))
+        return f"{n}+" if unfinished else f"{n}"
+
+    def _has_more(self):
+        # есть ли маршруты, которых ещё нет в списке
+        return self.paths_list.size() < len(self.paths) or not getattr(self.paths, 'complete', True)
+
+    def _load_more(self, count=None):
+        # подгрузить ещё страницу маршрутов (или до count штук)
+        self.load_pending = False
+        if not self._has_more():
+            return
+        first = self.paths_list.size()
+        self.list_limit = max(count or 0, first + PAGE_SIZE)
+        if not getattr(self.paths, 'complete', True):
+            self.paths.fetch(self.list_limit)
+        self._append_list_entries(first)
+
+    def _on_list_scroll(self, first, last):
+        self.paths_scroll.set(first, last)
+        if float(last) >= 1.0 and self._has_more() and not self.load_pending:
+            self.load_pending = True
+            self.after_idle(self._load_more)
+
 if __name__ == '__main__':
     app = MazeApp()
     app.mainloop()
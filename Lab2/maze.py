@@ -0,0 +1,247 @@
+# Большие лабиринты: компактная сетка, генераторы и файлы.
+#
+# Grid хранит стены по биту на клетку (клетка i = r*cols + c — бит i % 8
+# байта i // 8), так что 1000×1000 занимает 125 КБ, а не миллион списков.
+# Генераторы строят идеальные лабиринты (ровно один путь между любыми двумя
+# комнатами): комнаты стоят в клетках с чётными координатами, проходы
+# прорубаются в клетках между ними.
+#
+# Формат файла (little-endian):
+#   заголовок  magic, версия u32, rows u32, cols u32, старт r,c u32, финиш r,c u32
+#   данные     биты стен, как в Grid.bits
+# load() отображает файл в память (mmap) и читает биты прямо из него.
+#
+#   python maze.py gen 1000 1000 --algo kruskal --seed 1 big.maze
+#   python maze.py solve big.maze
+
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+
+MAGIC = b'MAZE'
+VERSION = 1
+_HEADER = struct.Struct('<4sIIIIIII')
+
+# байт стен -> 8 байт «свободна ли клетка» (0/1), младший бит первым
+_UNPACK = [bytes(1 - (b >> k & 1) for k in range(8)) for b in range(256)]
+# байты 0/1 «свободна» -> цифры двоичной записи стен
+_WALL_DIGITS = bytes.maketrans(b'\x00\x01', b'10')
+
+
+class Grid:
+    # сетка стен по биту на клетку; bits может быть и только для чтения
+    # (memoryview файла, см. load). Строки по grid[r] отдаются списками, так
+    # что Grid подходит везде, где ждут список строк
+    def __init__(self, rows, cols, bits=None):
+        self.rows = rows
+        self.cols = cols
+        self.bits = bytearray((rows*cols + 7) // 8) if bits is None else bits
+
+    @classmethod
+    def from_rows(cls, rows):
+        grid = cls(len(rows), len(rows[0]) if rows else 0)
+        for r, row in enumerate(rows):
+            for c, v in enumerate(row):
+                if v:
+                    grid.set_wall(r, c, True)
+        return grid
+
+    @classmethod
+    def from_open(cls, rows, cols, cells):
+        # из байтов 0/1 по клеткам (1 — свободна)
+        walls = int(bytes(cells[::-1]).translate(_WALL_DIGITS) or b'0', 2)
+        return cls(rows, cols, bytearray(walls.to_bytes((rows*cols + 7) // 8, 'little')))
+
+    def is_wall(self, r, c):
+        i = r*self.cols + c
+        return self.bits[i >> 3] >> (i & 7) & 1
+
+    def set_wall(self, r, c, wall):
+        i = r*self.cols + c
+        if wall:
+            self.bits[i >> 3] |= 1 << (i & 7)
+        else:
+            self.bits[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+
+    def open_cells(self):
+        # байт на клетку, 1 — свободна (так Board строит свои маски)
+        return bytearray(b''.join(_UNPACK[b] for b in self.bits)[:self.rows*self.cols])
+
+    def to_rows(self):
+        return [self[r] for r in range(self.rows)]
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, r):
+        if not 0 <= r < self.rows:
+            raise IndexError(r)
+        return [self.is_wall(r, c) for c in range(self.cols)]
+
+    def __iter__(self):
+        for r in range(self.rows):
+            yield self[r]
+
+
+# --- Генераторы ---
+
+def last_room(rows, cols):
+    # нижняя правая комната: при чётном размере последняя строка/столбец — стена
+    return rows - 1 - (rows + 1) % 2, cols - 1 - (cols + 1) % 2
+
+
+def _rooms(rows, cols):
+    # (свободные клетки, число комнат по высоте и ширине)
+    return bytearray(rows*cols), (rows + 1) // 2, (cols + 1) // 2
+
+
+def backtracker(rows, cols, seed=None):
+    # рекурсивный возврат (итеративно): длинные извилистые коридоры
+    rng = random.Random(seed)
+    cells, h, w = _rooms(rows, cols)
+    seen = bytearray(h*w)
+    seen[0] = 1
+    cells[0] = 1
+    stack = [0]
+    while stack:
+        room = stack[-1]
+        i, j = divmod(room, w)
+        options = [(di, dj) for di, dj in ((0, 1), (0, -1), (1, 0), (-1, 0))
+                   if 0 <= i+di < h and 0 <= j+dj < w and not seen[(i+di)*w + j+dj]]
+        if not options:
+            stack.pop()
+            continue
+        di, dj = rng.choice(options)
+        nxt = (i+di)*w + j+dj
+        seen[nxt] = 1
+        cells[(2*i + di)*cols + 2*j + dj] = 1
+        cells[2*(i+di)*cols + 2*(j+dj)] = 1
+        stack.append(nxt)
+    return Grid.from_open(rows, cols, cells)
+
+
+def prim(rows, cols, seed=None):
+    # случайный Прим: рост от одной комнаты через случайное ребро границы,
+    # много коротких тупиков
+    rng = random.Random(seed)
+    cells, h, w = _rooms(rows, cols)
+    seen = bytearray(h*w)
+    edges = []
+
+    def add(room):
+        seen[room] = 1
+        i, j = divmod(room, w)
+        cells[2*i*cols + 2*j] = 1
+        for di, dj in ((0, 1), (0, -1), (1, 0), (-1, 0)):
+            if 0 <= i+di < h and 0 <= j+dj < w and not seen[(i+di)*w + j+dj]:
+                edges.append((room, di, dj))
+
+    add(0)
+    while edges:
+        k = rng.randrange(len(edges))
+        edges[k], edges[-1] = edges[-1], edges[k]
+        room, di, dj = edges.pop()
+        i, j = divmod(room, w)
+        nxt = (i+di)*w + j+dj
+        if seen[nxt]:
+            continue
+        cells[(2*i + di)*cols + 2*j + dj] = 1
+        add(nxt)
+    return Grid.from_open(rows, cols, cells)
+
+
+def kruskal(rows, cols, seed=None):
+    # случайный Краскал: рёбра в случайном порядке, объединение множеств
+    rng = random.Random(seed)
+    cells, h, w = _rooms(rows, cols)
+    parent = array('i', range(h*w))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    edges = [(i*w + j, 0, 1) for i in range(h) for j in range(w - 1)]
+    edges += [(i*w + j, 1, 0) for i in range(h - 1) for j in range(w)]
+    rng.shuffle(edges)
+    for i in range(h):
+        for j in range(w):
+            cells[2*i*cols + 2*j] = 1
+    for room, di, dj in edges:
+        a = find(room)
+        b = find(room + di*w + dj)
+        if a == b:
+            continue
+        parent[a] = b
+        i, j = divmod(room, w)
+        cells[(2*i + di)*cols + 2*j + dj] = 1
+    return Grid.from_open(rows, cols, cells)
+
+
+GENERATORS = {'backtracker': backtracker, 'prim': prim, 'kruskal': kruskal}
+
+
+# --- Файлы ---
+
+def save(path, grid, start, end):
+    if not isinstance(grid, Grid):
+        grid = Grid.from_rows(grid)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, grid.rows, grid.cols, *start, *end))
+        f.write(grid.bits)
+    os.replace(tmp, path)
+
+
+def load(path):
+    # (Grid, старт, финиш); биты Grid читаются прямо из отображённого файла,
+    # для правки их надо скопировать: Grid(rows, cols, bytearray(grid.bits))
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < _HEADER.size:
+            raise ValueError(f"{path}: не лабиринт версии {VERSION}")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, rows, cols, sr, sc, er, ec = _HEADER.unpack_from(mm, 0)
+    size = (rows*cols + 7) // 8
+    if magic != MAGIC or version != VERSION or len(mm) < _HEADER.size + size:
+        mm.close()
+        raise ValueError(f"{path}: не лабиринт версии {VERSION}")
+    if not (rows > 0 and cols > 0 and sr < rows and er < rows and sc < cols and ec < cols):
+        mm.close()
+        raise ValueError(f"{path}: размер {rows}×{cols} или старт/финиш вне сетки")
+    bits = memoryview(mm)[_HEADER.size:_HEADER.size + size]
+    return Grid(rows, cols, bits), (sr, sc), (er, ec)
+
+
+if __name__ == "__main__":
+    from paths import shortest_path
+
+    ap = argparse.ArgumentParser(description="Большие лабиринты: генерация и кратчайший путь")
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    gen = sub.add_parser('gen', help="создать лабиринт")
+    gen.add_argument('rows', type=int)
+    gen.add_argument('cols', type=int)
+    gen.add_argument('path')
+    gen.add_argument('--algo', choices=list(GENERATORS), default='backtracker')
+    gen.add_argument('--seed', type=int)
+    solve = sub.add_parser('solve', help="кратчайший путь в лабиринте из файла")
+    solve.add_argument('path')
+    args = ap.parse_args()
+
+    t0 = time.time()
+    if args.cmd == 'gen':
+        grid = GENERATORS[args.algo](args.rows, args.cols, args.seed)
+        save(args.path, grid, (0, 0), last_room(args.rows, args.cols))
+        print(f"{args.path}: {args.rows}×{args.cols} ({time.time()-t0:.1f} s)", file=sys.stderr)
+    else:
+        grid, start, end = load(args.path)
+        path = shortest_path(grid, start, end)
+        if path is None:
+            print("Пути нет")
+        else:
+            print(f"Кратчайший путь: {len(path)} клеток ({time.time()-t0:.1f} s)")
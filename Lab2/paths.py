@@ -0,0 +1,910 @@
+# Перебор простых путей в лабиринте без Tk.
+#
+# Клетка (r, c) нумеруется как r*cols + c, посещённые клетки хранятся в одном
+# целом числе-битовой маске. Путь растёт и откатывается на месте, без копий.
+# Ветка бросается, как только финиш недостижим через непосещённые клетки.
+#
+# Соседи перебираются в порядке вправо, влево, вниз, вверх — в том же
+# порядке пути выдавал прежний стек в MazeApp.solve, поэтому после
+# устойчивой сортировки по длине список совпадает с прежним.
+
+import heapq
+import multiprocessing
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+# вправо, влево, вниз, вверх
+STEPS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+_DIRECTION = {step: i for i, step in enumerate(STEPS)}
+
+
+_DIGITS = bytes.maketrans(b'\x00\x01', b'01')
+
+# до скольких клеток соседи хранятся списками; на больших сетках они
+# вычисляются при обращении, чтобы не держать по списку на клетку
+_TABLE_LIMIT = 1 << 16
+
+
+def _mask(cells):
+    # байты 0/1 по клеткам -> маска, клетка i — бит i
+    return int(bytes(cells[::-1]).translate(_DIGITS) or b'0', 2)
+
+
+class Board:
+    # маски и соседи для одной сетки: список строк (0 — пусто, 1 — стена)
+    # или maze.Grid
+    def __init__(self, grid):
+        if hasattr(grid, 'open_cells'):
+            self.rows, self.cols = grid.rows, grid.cols
+            self.open = grid.open_cells()
+        else:
+            self.rows = len(grid)
+            self.cols = len(grid[0]) if grid else 0
+            self.open = bytearray(v == 0 for row in grid for v in row)
+        self.free = _mask(self.open)
+        # маски клеток, куда можно попасть сдвигом на 1 без перехода через край строки
+        self.not_first = _mask((b'\x00' + b'\x01'*(self.cols - 1))*self.rows)
+        self.not_last = _mask((b'\x01'*(self.cols - 1) + b'\x00')*self.rows)
+        if self.rows*self.cols <= _TABLE_LIMIT:
+            self.neighbours = [self._free_neighbours(i) for i in range(self.rows*self.cols)]
+        else:
+            self.neighbours = _Neighbours(self)
+
+    def index(self, pos):
+        return pos[0]*self.cols + pos[1]
+
+    def set_wall(self, i, wall):
+        # переключить клетку i и пересобрать соседей у неё и вокруг неё
+        self.open[i] = 0 if wall else 1
+        if wall:
+            self.free &= ~(1 << i)
+        else:
+            self.free |= 1 << i
+        r, c = self.cell(i)
+        for dr, dc in [(0, 0)] + STEPS:
+            nr, nc = r+dr, c+dc
+            if 0 <= nr < self.rows and 0 <= nc < self.cols:
+                j = nr*self.cols + nc
+                self.neighbours[j] = self._free_neighbours(j)
+
+    def _free_neighbours(self, i):
+        # свободные соседи клетки i в порядке STEPS
+        cols = self.cols
+        is_open = self.open
+        c = i % cols
+        nb = []
+        if c + 1 < cols and is_open[i+1]:
+            nb.append(i+1)
+        if c > 0 and is_open[i-1]:
+            nb.append(i-1)
+        if i + cols < len(is_open) and is_open[i+cols]:
+            nb.append(i+cols)
+        if i >= cols and is_open[i-cols]:
+            nb.append(i-cols)
+        return nb
+
+    def cell(self, i):
+        return divmod(i, self.cols)
+
+    def reaches(self, src, target, blocked):
+        # есть ли путь из клетки src в target по свободным клеткам вне blocked;
+        # заливка идёт сразу по всей маске сдвигами
+        free = self.free & ~blocked
+        cols = self.cols
+        reach = 1 << src
+        goal = 1 << target
+        while True:
+            grow = (reach | (reach << 1) & self.not_first | (reach >> 1) & self.not_last
+                    | reach << cols | reach >> cols) & free
+            if grow & goal:
+                return True
+            if grow == reach:
+                return False
+            reach = grow
+
+
+class _Neighbours:
+    # таблица соседей, которая ничего не хранит: список строится при обращении
+    def __init__(self, board):
+        self._board = board
+
+    def __getitem__(self, i):
+        return self._board._free_neighbours(i)
+
+    def __setitem__(self, i, value):
+        pass
+
+
+def iter_paths(grid, start, end, board=None, budget=None):
+    # все простые пути от start до end (списки координат) в порядке обхода;
+    # с budget (см. Budget) перебор обрывается, когда тот исчерпан
+    board = board or Board(grid)
+    s = board.index(start)
+    t = board.index(end)
+    if not (board.free >> s & 1 and board.free >> t & 1):
+        return
+    if s == t:
+        yield [start]
+        return
+    yield from _walk(board, [s], t, budget=budget)
+
+
+def iter_paths_by_length(grid, start, end, board=None, budget=None):
+    # те же пути сразу в порядке all_paths: по длине, при равной длине — в
+    # порядке обхода. Для каждой длины обход повторяется с отсечением по
+    # расстоянию до финиша (BFS без учёта посещённых), поэтому первые пути
+    # появляются сразу, а в памяти держится только текущий путь
+    board = board or Board(grid)
+    s = board.index(start)
+    t = board.index(end)
+    if not (board.free >> s & 1 and board.free >> t & 1):
+        return
+    if s == t:
+        yield [start]
+        return
+    dist = distances(board, t)
+    if dist[s] < 0:
+        return
+    length = dist[s] + 1
+    while True:
+        cut = []
+        yield from _walk(board, [s], t, length, dist, cut, budget)
+        if not cut:
+            return  # длиннее путей нет: ни одна ветка не упёрлась в длину
+        if budget is not None and budget.reason:
+            return
+        # длины путей между двумя клетками сетки одной чётности
+        length += 2
+
+
+class Budget:
+    # предел перебора по времени (секунды с создания) и по числу узлов —
+    # шагов обхода вглубь. _walk отчитывается раз в CHECK_NODES узлов, так
+    # что часы не дёргаются на каждом шаге. stop() можно вызвать из другого
+    # потока; после остановки reason — 'time', 'nodes' или 'stop'. event
+    # (multiprocessing.Event) передаёт остановку в процессы пула
+    CHECK_NODES = 256
+
+    def __init__(self, seconds=None, nodes=None, event=None):
+        self.max_nodes = nodes
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+        self.nodes = 0
+        self.reason = None
+        self.event = event
+        self._stopped = False
+
+    def stop(self):
+        self._stopped = True
+        if self.event is not None:
+            self.event.set()
+
+    def spend(self, nodes):
+        # учесть ещё nodes узлов; True, если перебор пора прекратить
+        self.nodes += nodes
+        if self._stopped:
+            self.reason = 'stop'
+        elif self.max_nodes is not None and self.nodes >= self.max_nodes:
+            self.reason = 'nodes'
+        elif self.deadline is not None and time.monotonic() >= self.deadline:
+            self.reason = 'time'
+        elif self.event is not None and self.event.is_set():
+            self.reason = 'stop'
+        return self.reason is not None
+
+
+def _walk(board, prefix, t, length=None, dist=None, cut=None, budget=None):
+    # обход в глубину от конца prefix (номера клеток, начиная со старта) до
+    # t. С length — только пути ровно из length клеток; если ветка отброшена
+    # из-за длины, в cut добавляется отметка. С budget узлы (шаги вглубь)
+    # записываются в него, и обход прекращается, когда бюджет исчерпан
+    neighbours = board.neighbours
+    cells = [board.cell(i) for i in range(board.rows*board.cols)]
+    end = cells[t]
+    path = list(prefix)
+    route = [cells[i] for i in path]  # тот же путь в координатах, копируется при выдаче
+    visited = 0
+    for i in path:
+        visited |= 1 << i
+    if budget is not None and budget.spend(0):
+        return
+    spent = 0  # узлы, ещё не записанные в budget
+    stack = [iter(neighbours[path[-1]])]
+    try:
+        while stack:
+            for n in stack[-1]:
+                if visited >> n & 1:
+                    continue
+                if n == t:
+                    if length is None or len(route) + 1 == length:
+                        yield route + [end]
+                    continue
+                if length is not None and len(route) + 1 + dist[n] > length:
+                    if not cut:
+                        cut.append(n)
+                    continue
+                visited |= 1 << n
+                if not board.reaches(n, t, visited):
+                    visited ^= 1 << n
+                    continue
+                path.append(n)
+                route.append(cells[n])
+                stack.append(iter(neighbours[n]))
+                if budget is not None:
+                    spent += 1
+                    if spent == Budget.CHECK_NODES:
+                        spent = 0
+                        if budget.spend(Budget.CHECK_NODES):
+                            return
+                break
+            else:
+                stack.pop()
+                route.pop()
+                visited ^= 1 << path.pop()
+    finally:
+        if budget is not None:
+            budget.nodes += spent
+
+
+class PathStore:
+    # маршруты из одной стартовой клетки в виде дерева префиксов. Узел —
+    # один шаг, 4 байта: (родитель << 2) | направление из STEPS, маршрут —
+    # номер его последнего узла. Новый маршрут продолжает общий префикс с
+    # предыдущим, а соседние пути обхода почти целиком совпадают, так что на
+    # маршрут уходит несколько узлов вместо списка кортежей
+    def __init__(self, paths=()):
+        self.start = None
+        self._nodes = array('I')    # узел i хранится в _nodes[i-1], 0 — корень
+        self._ends = array('I')
+        self._lengths = array('I')
+        self._last_dirs = []
+        self._last_nodes = []
+        for path in paths:
+            self.append(path)
+
+    def append(self, path):
+        if self.start is None:
+            self.start = path[0]
+        elif path[0] != self.start:
+            raise ValueError("маршруты должны начинаться в одной клетке")
+        dirs = [_DIRECTION[r1-r0, c1-c0] for (r0, c0), (r1, c1) in zip(path, path[1:])]
+        last = self._last_dirs
+        k = 0
+        n = min(len(dirs), len(last))
+        while k < n and dirs[k] == last[k]:
+            k += 1
+        nodes = self._last_nodes[:k]
+        node = nodes[-1] if nodes else 0
+        for d in dirs[k:]:
+            self._nodes.append(node << 2 | d)
+            node = len(self._nodes)
+            nodes.append(node)
+        # _ends последним: len() растёт, только когда маршрут записан целиком,
+        # так что читать готовые маршруты можно, пока другой поток добавляет
+        self._lengths.append(len(path))
+        self._ends.append(node)
+        self._last_dirs = dirs
+        self._last_nodes = nodes
+
+    def __len__(self):
+        return len(self._ends)
+
+    def __getitem__(self, index):
+        node = self._ends[index]
+        dirs = []
+        while node:
+            v = self._nodes[node - 1]
+            dirs.append(v & 3)
+            node = v >> 2
+        r, c = self.start
+        path = [(r, c)]
+        for d in reversed(dirs):
+            dr, dc = STEPS[d]
+            r += dr
+            c += dc
+            path.append((r, c))
+        return path
+
+    def __iter__(self):
+        # в порядке добавления. Маршрут отличается от предыдущего только
+        # своими новыми узлами, их номера больше всех прежних, поэтому
+        # разбирается только хвост, а префикс берётся у предыдущего
+        prev = []
+        prev_end = 0
+        for end, length in zip(self._ends, self._lengths):
+            dirs = []
+            node = end
+            while node > prev_end:
+                v = self._nodes[node - 1]
+                dirs.append(v & 3)
+                node = v >> 2
+            path = prev[:length - len(dirs)] or [self.start]
+            r, c = path[-1]
+            for d in reversed(dirs):
+                dr, dc = STEPS[d]
+                r += dr
+                c += dc
+                path.append((r, c))
+            yield path
+            prev = path
+            prev_end = max(prev_end, end)
+
+    def length(self, index):
+        return self._lengths[index]
+
+
+class LazyPaths:
+    # пути из генератора, подгружаемые по мере обращения и хранимые в
+    # PathStore. len() — сколько уже получено, complete — получены ли все
+    def __init__(self, source):
+        self._source = iter(source)
+        self._paths = PathStore()
+        self.complete = False
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __getitem__(self, index):
+        self.fetch(index + 1)
+        return self._paths[index]
+
+    def length(self, index):
+        self.fetch(index + 1)
+        return self._paths.length(index)
+
+    def fetch(self, count):
+        # догрузить пути, пока их меньше count; возвращает, сколько есть
+        while not self.complete and len(self._paths) < count:
+            try:
+                self._paths.append(next(self._source))
+            except StopIteration:
+                self.complete = True
+        return len(self._paths)
+
+
+def distances(board, target, blocked=0, until=()):
+    # BFS: число шагов от каждой клетки до target в обход клеток из маски
+    # blocked, -1 — недостижима. С until обход останавливается, как только
+    # размечена ближайшая из этих клеток и все клетки не дальше неё
+    dist = [-1]*(board.rows*board.cols)
+    dist[target] = 0
+    queue = [target]
+    limit = None
+    for i in queue:
+        d = dist[i] + 1
+        if limit is not None and d > limit:
+            break
+        for n in board.neighbours[i]:
+            if dist[n] < 0 and not blocked >> n & 1:
+                dist[n] = d
+                queue.append(n)
+                if limit is None and n in until:
+                    limit = d
+    return dist
+
+
+def shortest_path(grid, start, end, board=None):
+    # кратчайший путь или None. Из равных по длине берётся первый в порядке
+    # обхода iter_paths — тот же, что стоит первым в all_paths
+    board = board or Board(grid)
+    s = board.index(start)
+    t = board.index(end)
+    if not (board.free >> s & 1 and board.free >> t & 1):
+        return None
+    return _descend(board, distances(board, t), s, t)
+
+
+def _descend(board, dist, s, t):
+    # спуск по расстояниям до t: на каждом шаге первый в порядке обхода
+    # сосед, который на шаг ближе; None, если t недостижима
+    if dist[s] < 0:
+        return None
+    path = [board.cell(s)]
+    i = s
+    while i != t:
+        i = next(n for n in board.neighbours[i] if dist[n] == dist[i] - 1)
+        path.append(board.cell(i))
+    return path
+
+
+def k_shortest_paths(grid, start, end, k, board=None):
+    # первые k путей в порядке all_paths (по длине, при равной длине — в
+    # порядке обхода) без полного перебора: алгоритм Йена. Каждое
+    # ответвление — первый в порядке обхода кратчайший путь при запретах,
+    # кандидаты сравниваются по (длина, номера направлений шагов)
+    board = board or Board(grid)
+    s = board.index(start)
+    t = board.index(end)
+    if k <= 0 or not (board.free >> s & 1 and board.free >> t & 1):
+        return
+    if s == t:
+        yield [start]
+        return
+    neighbours = board.neighbours
+
+    def key(path):
+        return (len(path), tuple(neighbours[a].index(b) for a, b in zip(path, path[1:])))
+
+    def spur(i, blocked, banned):
+        # путь от i до t в обход blocked, первый шаг не в banned
+        steps = [n for n in neighbours[i] if n not in banned and not blocked >> n & 1]
+        dist = distances(board, t, blocked, steps)
+        steps = [n for n in steps if dist[n] >= 0]
+        if not steps:
+            return None
+        n = min(steps, key=lambda n: dist[n])
+        path = [i, n]
+        while n != t:
+            n = next(m for m in neighbours[n] if dist[m] == dist[n] - 1)
+            path.append(n)
+        return path
+
+    first = spur(s, 1 << s, ())
+    if first is None:
+        return
+    seen = {key(first)}
+    # корень (префикс найденного пути) -> клетки, куда из него уже уходили
+    branches = {}
+    candidates = []
+    path, dev = first, 0  # dev — где путь отошёл от того, из которого получен
+    for found in range(1, k + 1):
+        yield [board.cell(i) for i in path]
+        if found == k:
+            return
+        for j in range(len(path) - 1):
+            branches.setdefault(tuple(path[:j+1]), set()).add(path[j+1])
+        # корни короче dev общие с родителем, их ответвления уже в кандидатах
+        blocked = 0
+        for i in path[:dev]:
+            blocked |= 1 << i
+        for j in range(dev, len(path) - 1):
+            root = path[:j+1]
+            blocked |= 1 << path[j]
+            tail = spur(path[j], blocked, branches[tuple(root)])
+            if tail is None:
+                continue
+            cand = root + tail[1:]
+            ck = key(cand)
+            if ck not in seen:
+                seen.add(ck)
+                heapq.heappush(candidates, (ck, j, cand))
+        if not candidates:
+            return
+        _, dev, path = heapq.heappop(candidates)
+
+
+def all_paths(grid, start, end):
+    # все пути, отсортированные по длине (при равной длине — в порядке обхода)
+    paths = list(iter_paths(grid, start, end))
+    paths.sort(key=len)
+    return paths
+
+
+# --- Параллельный перебор ---
+#
+# Дерево обхода режется на небольшой глубине: получается список префиксов
+# (и уже дошедших до финиша коротких путей) в порядке обхода. Поддеревья
+# префиксов перебираются в пуле процессов, результаты приходят в том же
+# порядке (executor.map), поэтому склеенный список совпадает с iter_paths.
+# С бюджетом поддеревья перебираются с общим сроком, общим Event остановки
+# и общим счётчиком узлов (см. _PoolBudget).
+
+_worker_board = None
+_worker_stop = None
+_worker_nodes = None
+
+
+def _pool_context():
+    # пул запускается и из рабочего потока GUI, а fork() многопоточного
+    # процесса может оставить потомка с захваченной блокировкой
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class _PoolBudget(Budget):
+    # бюджет одной задачи пула: узлы при каждой проверке добавляются в
+    # общий счётчик (multiprocessing.Value), и задача, которая довела его
+    # до лимита, останавливает остальные через event
+    def __init__(self, seconds, max_nodes, event, counter):
+        super().__init__(seconds, None, event)
+        self.limit = max_nodes
+        self.counter = counter
+        self.shared = 0  # сколько из nodes уже в счётчике
+
+    def spend(self, nodes):
+        self.nodes += nodes
+        self.flush()
+        return super().spend(0)
+
+    def flush(self):
+        with self.counter.get_lock():
+            self.counter.value += self.nodes - self.shared
+            total = self.counter.value
+        self.shared = self.nodes
+        if self.limit is not None and total >= self.limit:
+            self.event.set()
+
+
+def _init_worker(grid, stop, nodes):
+    global _worker_board, _worker_stop, _worker_nodes
+    _worker_board = Board(grid)
+    _worker_stop = stop
+    _worker_nodes = nodes
+
+
+def _expand(task):
+    # все пути поддерева одного префикса (или найденные до исчерпания
+    # бюджета), упакованные в PathStore; deadline — time.time() окончания
+    prefix, t, deadline, max_nodes = task
+    board = _worker_board
+    store = PathStore()
+    budget = _PoolBudget(None if deadline is None else deadline - time.time(), max_nodes,
+                         _worker_stop, _worker_nodes)
+    if prefix[-1] == t:
+        store.append([board.cell(i) for i in prefix])
+    else:
+        for path in _walk(board, prefix, t, budget=budget):
+            store.append(path)
+        budget.flush()
+    return store
+
+
+def _frontier(board, s, t, size, budget=None):
+    # префиксы в порядке обхода: дерево раскрывается по уровням, пока их не
+    # станет хотя бы size или пока все не дойдут до финиша. Каждый новый
+    # префикс, не дошедший до финиша, — узел, как шаг вглубь в _walk; если
+    # бюджет исчерпан, возвращается None
+    neighbours = board.neighbours
+    items = [([s], 1 << s)]  # (префикс, маска его клеток)
+    while len(items) < size and any(item[-1] != t for item, _ in items):
+        grown = []
+        nodes = 0
+        for item, visited in items:
+            if item[-1] == t:
+                grown.append((item, visited))
+                continue
+            for n in neighbours[item[-1]]:
+                if visited >> n & 1:
+                    continue
+                if n == t:
+                    grown.append((item + [n], visited))
+                elif board.reaches(n, t, visited | 1 << n):
+                    grown.append((item + [n], visited | 1 << n))
+                    nodes += 1
+        items = grown
+        if budget is not None and budget.spend(nodes):
+            return None
+    return [item for item, _ in items]
+
+
+def iter_paths_parallel(grid, start, end, workers, board=None, budget=None):
+    # то же, что iter_paths, но поддеревья перебирают workers процессов
+    board = board or Board(grid)
+    s = board.index(start)
+    t = board.index(end)
+    if not (board.free >> s & 1 and board.free >> t & 1):
+        return
+    if s == t:
+        yield [start]
+        return
+    prefixes = _frontier(board, s, t, workers*16, budget)
+    if prefixes is None:
+        return
+    context = _pool_context()
+    stop = context.Event()
+    nodes = context.Value('q', 0 if budget is None else budget.nodes)  # узлы фронтира уже учтены
+    deadline = max_nodes = None
+    if budget is not None:
+        budget.event = stop
+        max_nodes = budget.max_nodes
+        if budget.deadline is not None:
+            deadline = time.time() + budget.deadline - time.monotonic()
+    tasks = [(prefix, t, deadline, max_nodes) for prefix in prefixes]
+    pool = ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                               initargs=(grid, stop, nodes))
+    try:
+        for store in pool.map(_expand, tasks):
+            yield from store
+            if budget is not None and budget.spend(nodes.value - budget.nodes):
+                stop.set()
+                return
+    finally:
+        # при досрочном закрытии генератора недоделанные поддеревья отменяются
+        pool.shutdown(cancel_futures=True)
+
+
+def all_paths_parallel(grid, start, end, workers, budget=None):
+    # все пути в порядке all_paths, сразу в PathStore; с budget — найденные
+    # до его исчерпания
+    return sort_by_length(iter_paths_parallel(grid, start, end, workers, budget=budget))
+
+
+def sort_by_length(paths, store=None):
+    # пути в PathStore (новый или store) по длине: раскладываются по длинам
+    # (внутри длины исходный порядок сохраняется), затем склеиваются
+    buckets = {}
+    for path in paths:
+        buckets.setdefault(len(path), PathStore()).append(path)
+    store = PathStore() if store is None else store
+    for n in sorted(buckets):
+        for path in buckets[n]:
+            store.append(path)
+    return store
+
+
+# --- Подсчёт путей без перебора ---
+#
+# Динамика по фронтиру: клетки обходятся по строкам, состояние — метки рёбер,
+# пересекающих границу между обработанными и необработанными клетками
+# (cols рёбер вниз и одно ребро вправо от последней клетки). Обработанная
+# часть пути — набор отрезков: у отрезка, идущего от старта или финиша,
+# на границе один конец с меткой D, у остальных два конца с общей меткой.
+# Число состояний зависит только от ширины, поэтому сетка поворачивается
+# узкой стороной к фронтиру.
+
+D = 1
+
+
+def _normalize(plugs):
+    # метки пар перенумеровываются по первому появлению, чтобы одинаковые
+    # состояния совпадали
+    names = {}
+    out = []
+    for p in plugs:
+        if p > D:
+            if p not in names:
+                names[p] = len(names) + 2
+            p = names[p]
+        out.append(p)
+    return tuple(out)
+
+
+def _partner(plugs, i):
+    # индекс второго конца отрезка, один конец которого в plugs[i]
+    p = plugs[i]
+    for j, q in enumerate(plugs):
+        if q == p and j != i:
+            return j
+
+
+def _narrow(grid, start, end):
+    # сетка (копия), повёрнутая узкой стороной к фронтиру, и концы в ней
+    rows = len(grid)
+    cols = len(grid[0]) if grid else 0
+    if cols > rows:
+        return [list(col) for col in zip(*grid)], start[::-1], end[::-1], True
+    return [row[:] for row in grid], start, end, False
+
+
+def count_paths(grid, start, end, budget=None):
+    # число простых путей от start до end; те же пути, что даёт iter_paths.
+    # С budget узлы — обработанные состояния (число состояний ограничивает
+    # и память); если бюджет исчерпан, возвращается None
+    grid, start, end, _ = _narrow(grid, start, end)
+    if grid[start[0]][start[1]] or grid[end[0]][end[1]]:
+        return 0
+    if start == end:
+        return 1
+    total = 0
+    for _, total in _count_rows(grid, start, end, budget=budget):
+        pass
+    if budget is not None and budget.reason:
+        return None
+    return total
+
+
+def _count_rows(grid, start, end, r0=0, states=None, total=0, budget=None):
+    # динамика с начала строки r0 из состояний states (по умолчанию — с
+    # начала сетки); после каждой строки выдаёт (states, total)
+    if budget is not None and budget.spend(0):
+        return
+    spent = 0  # состояния, ещё не записанные в budget
+    rows = len(grid)
+    cols = len(grid[0])
+    if states is None:
+        states = {(0,)*(cols + 1): 1}  # plugs[0..cols-1] — рёбра вниз, plugs[cols] — вправо
+    fresh = cols + 3  # заведомо неиспользованная метка пары
+    for r in range(r0, rows):
+        for c in range(cols):
+            wall = grid[r][c] == 1
+            terminal = (r, c) == start or (r, c) == end
+            can_right = c + 1 < cols and grid[r][c+1] == 0
+            can_down = r + 1 < rows and grid[r+1][c] == 0
+            nxt = {}
+
+            def emit(plugs, down, right, n):
+                plugs[c] = down
+                plugs[cols] = right
+                key = _normalize(plugs)
+                nxt[key] = nxt.get(key, 0) + n
+
+            for state, n in states.items():
+                if budget is not None:
+                    spent += 1
+                    if spent == Budget.CHECK_NODES:
+                        spent = 0
+                        if budget.spend(Budget.CHECK_NODES):
+                            return
+                up = state[c]
+                left = state[cols]
+                if wall:
+                    if not up and not left:
+                        emit(list(state), 0, 0, n)
+                    continue
+                if terminal:
+                    if up and left:
+                        continue
+                    if not up and not left:
+                        # отсюда начинается отрезок с висячим концом
+                        if can_down:
+                            emit(list(state), D, 0, n)
+                        if can_right:
+                            emit(list(state), 0, D, n)
+                        continue
+                    # в старт/финиш входит отрезок и заканчивается здесь
+                    plugs = list(state)
+                    i = c if up else cols
+                    if plugs[i] == D:
+                        plugs[i] = 0
+                        if not any(plugs):
+                            total += n
+                        continue
+                    plugs[_partner(plugs, i)] = D
+                    emit(plugs, 0, 0, n)
+                    continue
+                if not up and not left:
+                    emit(list(state), 0, 0, n)
+                    if can_down and can_right:
+                        emit(list(state), fresh, fresh, n)
+                    continue
+                if not up or not left:
+                    a = up or left
+                    if can_down:
+                        emit(list(state), a, 0, n)
+                    if can_right:
+                        emit(list(state), 0, a, n)
+                    continue
+                # сходятся два отрезка
+                if up == left and up != D:
+                    continue  # цикл
+                plugs = list(state)
+                if up == D and left == D:
+                    plugs[c] = plugs[cols] = 0
+                    if not any(plugs):
+                        total += n
+                    continue
+                if up == D or left == D:
+                    pair = c if left == D else cols
+                    plugs[_partner(plugs, pair)] = D
+                else:
+                    plugs[_partner(plugs, cols)] = up
+                emit(plugs, 0, 0, n)
+            states = nxt
+        if budget is not None:
+            budget.nodes += spent
+            spent = 0
+        yield states, total
+
+
+# --- Пересчёт после правки стен ---
+
+class IncrementalSolver:
+    # кратчайший путь и число путей для одной пары старт/финиш. После
+    # переключения клетки расстояния до финиша правятся только там, где
+    # могли измениться. Для подсчёта хранятся состояния динамики на началах
+    # строк; правка отменяет только строки ниже строки над клеткой, и
+    # динамика продолжается с последней сохранённой.
+    #
+    # Подсчёт идёт в рабочем потоке по снимку (snapshot): count считает по
+    # нему, не трогая решатель, а keep в потоке правок сохраняет досчитанные
+    # строки, если после снимка правок не было. Хранятся только состояния,
+    # которые уже обработаны, так что лимит узлов бюджета ограничивает и их
+    def __init__(self, grid, start, end):
+        self.board = Board(grid)
+        self.s = self.board.index(start)
+        self.t = self.board.index(end)
+        if self.board.free >> self.t & 1:
+            self.dist = distances(self.board, self.t)
+        else:
+            self.dist = [-1]*(self.board.rows*self.board.cols)
+        self._grid, self._start, self._end, self._transposed = _narrow(grid, start, end)
+        self._rows = [(None, 0)]  # (состояния, число путей) на начале строк
+        self._edit = object()  # меняется при каждой правке
+
+    def shortest_path(self):
+        return _descend(self.board, self.dist, self.s, self.t)
+
+    def set_cell(self, r, c, wall):
+        i = self.board.index((r, c))
+        if bool(self.board.free >> i & 1) != bool(wall) or i == self.s or i == self.t:
+            return
+        self.board.set_wall(i, wall)
+        if wall:
+            self._remove(i)
+        else:
+            self._insert(i)
+        if self._transposed:
+            r, c = c, r
+        self._grid[r][c] = 1 if wall else 0
+        # строка выше тоже смотрит на эту клетку (можно ли уйти вниз)
+        del self._rows[max(r - 1, 0) + 1:]
+        self._edit = object()
+
+    def snapshot(self):
+        # копия сетки и сохранённых строк; дальнейшие правки её не касаются
+        return [row[:] for row in self._grid], self._rows[:], self._edit
+
+    def count(self, snapshot, budget=None):
+        # число путей по снимку (None, если бюджет исчерпан); досчитанные
+        # строки дописываются в снимок
+        grid, rows, _ = snapshot
+        start, end = self._start, self._end
+        if grid[start[0]][start[1]] or grid[end[0]][end[1]] or start == end:
+            return count_paths(grid, start, end)  # вырожденные случаи, без динамики
+        states, total = rows[-1]
+        if len(rows) > len(grid):
+            return total
+        for row in _count_rows(grid, start, end, len(rows) - 1, states, total, budget):
+            rows.append(row)
+        if budget is not None and budget.reason:
+            return None
+        return rows[-1][1]
+
+    def keep(self, snapshot):
+        _, rows, edit = snapshot
+        if edit is self._edit and len(rows) > len(self._rows):
+            self._rows = rows
+
+    def _insert(self, v):
+        # клетка стала свободной: расстояния могут только уменьшиться,
+        # волна идёт от неё
+        dist = self.dist
+        neighbours = self.board.neighbours
+        best = [dist[n] for n in neighbours[v] if dist[n] >= 0]
+        if not best:
+            return
+        dist[v] = min(best) + 1
+        queue = [v]
+        for u in queue:
+            d = dist[u] + 1
+            for n in neighbours[u]:
+                if dist[n] < 0 or dist[n] > d:
+                    dist[n] = d
+                    queue.append(n)
+
+    def _remove(self, v):
+        # клетка стала стеной: меняются только клетки, у которых все
+        # кратчайшие дороги к финишу шли через неё. Они ищутся по уровням
+        # от v, затем их расстояния заново считаются от соседних клеток,
+        # оставшихся на месте
+        dist = self.dist
+        neighbours = self.board.neighbours
+        if dist[v] < 0:
+            return
+        affected = {v}
+        queue = [v]
+        for u in queue:
+            d = dist[u] + 1
+            for n in neighbours[u]:
+                if n in affected or dist[n] != d:
+                    continue
+                if any(dist[w] == d - 1 and w not in affected for w in neighbours[n]):
+                    continue
+                affected.add(n)
+                queue.append(n)
+        for a in affected:
+            dist[a] = -1
+        heap = []
+        for a in queue[1:]:
+            best = [dist[w] for w in neighbours[a] if dist[w] >= 0]
+            if best:
+                heap.append((min(best) + 1, a))
+        heapq.heapify(heap)
+        while heap:
+            d, a = heapq.heappop(heap)
+            if dist[a] >= 0:
+                continue
+            dist[a] = d
+            for n in neighbours[a]:
+                if dist[n] < 0 and n in affected:
+                    heapq.heappush(heap, (d + 1, n))
@@ -11,7 +11,6 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import time
 import random
-import sys
 
 # UI / визуальные настройки
 CELL = 48
@@ -29,6 +28,82 @@ COLOR_TEXT = "black"
 COLOR_HIGHLIGHT = "#ffeb3b"
 
 MOVES = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+TIME_CHECK_NODES = 1024  # как часто (в ходах) сверяться с таймаутом
+
+
+def knight_moves(n, m):
+    # для каждой клетки i = r*m + c — клетки, куда из неё ходит конь
+    table = []
+    for r in range(n):
+        for c in range(m):
+            table.append([nr*m + nc for dr, dc in MOVES
+                          for nr, nc in [(r+dr, c+dc)] if 0 <= nr < n and 0 <= nc < m])
+    return table
+
+
+def knight_tour(n, m, start, timeout, rng=random):
+    """
+    Обход конём доски n x m из start: правило Варнсдорфа с возвратами, без рекурсии.
+    Возвращает (список клеток (r,c) или None, истёк ли таймаут).
+    """
+    total = n * m
+    if total % 2 and sum(start) % 2:
+        # конь ходит с цвета на цвет; на доске с нечётным числом клеток обход
+        # начинается и кончается на цвете, которого на клетку больше
+        return None, False
+    moves = knight_moves(n, m)
+    visited = bytearray(total)
+    # число свободных клеток, куда можно пойти дальше; правится при каждом
+    # ходе и возврате, а не пересчитывается для каждого соседа
+    degree = bytearray(len(targets) for targets in moves)
+
+    def visit(i):
+        visited[i] = 1
+        for j in moves[i]:
+            degree[j] -= 1
+
+    def leave(i):
+        visited[i] = 0
+        for j in moves[i]:
+            degree[j] += 1
+
+    # при равном числе продолжений — сначала клетки дальше от центра (правило Рота)
+    far = [-((2*r - n + 1)**2 + (2*c - m + 1)**2) for r in range(n) for c in range(m)]
+
+    def candidates(i):
+        # сначала клетки с наименьшим числом продолжений, равные — дальше от
+        # центра, затем в случайном порядке
+        free = [j for j in moves[i] if not visited[j]]
+        if len(path) < total - 1 and any(degree[j] == 0 for j in free):
+            # из такой клетки хода нет: зайти в неё можно только последним ходом
+            return iter(())
+        keys = {j: (degree[j], far[j], rng.random()) for j in free}
+        return iter(sorted(free, key=keys.__getitem__))
+
+    deadline = time.monotonic() + timeout
+    s = start[0]*m + start[1]
+    path = [s]
+    visit(s)
+    stack = [candidates(s)]
+    nodes = 0
+    while len(path) < total:
+        for j in stack[-1]:
+            if visited[j]:
+                continue
+            path.append(j)
+            visit(j)
+            stack.append(candidates(j))
+            nodes += 1
+            if nodes % TIME_CHECK_NODES == 0 and time.monotonic() > deadline:
+                return None, True
+            break
+        else:
+            stack.pop()
+            leave(path.pop())
+            if not path:
+                return None, False
+    return [divmod(i, m) for i in path], False
+
 
 class KnightTourApp(tk.Tk):
     def __init__(self):
@@ -205,77 +280,19 @@ class KnightTourApp(tk.Tk):
             return
         self.start = (sr, sc)
         self.solution = None
-        total_cells = self.n * self.m
         timeout = float(self.var_timeout.get()) if self.var_timeout.get() > 0 else TIMEOUT_DEFAULT
         self.status.config(text=f"Поиск решения... (таймаут: {timeout:.1f}s). Подождите.")
         self.update()
 
-        start_time = time.time()
-        board = [[0]*self.m for _ in range(self.n)]
-        path = []
-
-        # Warnsdorff ordering helper
-        def degree(r,c, b):
-            cnt = 0
-            for dr,dc in MOVES:
-                nr, nc = r+dr, c+dc
-                if 0 <= nr < self.n and 0 <= nc < self.m and b[nr][nc] == 0:
-                    cnt += 1
-            return cnt
-
-        sys.setrecursionlimit(10000)
-
-        found = False
-
-        def dfs(r,c,step,b):
-            nonlocal found, start_time
-            # timeout check
-            if time.time() - start_time > timeout:
-                return False
-            if found:
-                return True
-            b[r][c] = step
-            path.append((r,c))
-            if step == total_cells:
-                found = True
-                return True
-            # generate neighbor list ordered by Warnsdorff (fewest onward moves)
-            neigh = []
-            for dr,dc in MOVES:
-                nr, nc = r+dr, c+dc
-                if 0 <= nr < self.n and 0 <= nc < self.m and b[nr][nc] == 0:
-                    neigh.append((degree(nr,nc,b), nr, nc))
-            neigh.sort(key=lambda x: x[0])
-            # optional random tie-break to avoid same deterministic failure modes
-            # group by degree and shuffle ties
-            i = 0
-            while i < len(neigh):
-                j = i
-                while j < len(neigh) and neigh[j][0] == neigh[i][0]:
-                    j += 1
-                if j - i > 1:
-                    sub = neigh[i:j]
-                    random.shuffle(sub)
-                    neigh[i:j] = sub
-                i = j
-            for _, nr, nc in neigh:
-                if dfs(nr, nc, step+1, b):
-                    return True
-            # backtrack
-            b[r][c] = 0
-            path.pop()
-            return False
-
-        ok = dfs(self.start[0], self.start[1], 1, board)
-        if ok and found:
-            # path holds the solution
-            self.solution = list(path)  # copy
+        solution, timed_out = knight_tour(self.n, self.m, self.start, timeout)
+        if solution:
+            self.solution = solution
             self.status.config(text=f"Найдено решение: {len(self.solution)} ходов.")
             # показать статично по умолчанию
             self._show_numbers_on_board()
         else:
             self.solution = None
-            if time.time() - start_time > timeout:
+            if timed_out:
                 self.status.config(text="Не найдено за отведённое время (таймаут).")
                 messagebox.showinfo("Результат", "Решение не найдено за указанный таймаут.")
             else: